@@ -0,0 +1,50 @@
+"""
+Lazily built Swagger/ReDoc views.
+
+drf_yasg and its openapi machinery are only imported when a docs URL is
+first requested, so workers that never serve docs don't pay for them. The
+generated schema is cached for API_DOCS_CACHE_TIMEOUT seconds instead of
+being rebuilt on every request.
+"""
+from functools import lru_cache
+
+from django.conf import settings
+
+
+@lru_cache(maxsize=None)
+def _schema_view():
+    from drf_yasg import openapi
+    from drf_yasg.views import get_schema_view
+    from rest_framework import permissions
+
+    return get_schema_view(
+        openapi.Info(
+            title="ALX_TRAVEL_APP API DOCUMENTATION",
+            default_version='v1',
+            description='API documentation generated by Swagger',
+            terms_of_service='https:www.google.com/policies/terms',
+            contact=openapi.Contact(email='williamnyamu08@gmail.com'),
+            license=openapi.License("BSD License"),
+        ),
+        public=True,
+        permission_classes=(permissions.AllowAny,)
+    )
+
+
+@lru_cache(maxsize=None)
+def _docs_view(renderer):
+    schema_view = _schema_view()
+    cache_timeout = settings.API_DOCS_CACHE_TIMEOUT
+    if renderer is None:
+        return schema_view.without_ui(cache_timeout=cache_timeout)
+    return schema_view.with_ui(renderer, cache_timeout=cache_timeout)
+
+
+def lazy_docs_view(renderer=None):
+    """
+    A view that builds the drf_yasg view on its first request.
+    renderer is 'swagger' or 'redoc', or None for the raw schema.
+    """
+    def view(request, *args, **kwargs):
+        return _docs_view(renderer)(request, *args, **kwargs)
+    return view
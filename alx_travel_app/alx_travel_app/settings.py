@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 import environ
 import os
+import sys
 
 #Initialize the environ
 env = environ.Env(
@@ -33,17 +34,15 @@ environ.Env.read_env(os.path.join(BASE_DIR, '.env'))
 SECRET_KEY = env('SECRET_KEY')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = env('DEBUG')
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = env.list('ALLOWED_HOSTS', default=[])
 
 
 # Application definition
 
 INSTALLED_APPS = [
     'rest_framework',
-    'drf_yasg',
-    'django_seed',
     'listings',
     'django.contrib.admin',
     'django.contrib.auth',
@@ -53,12 +52,29 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
 ]
 
+# Development-only apps
+# Only loaded when enabled, so production workers and unrelated manage.py
+# commands don't import drf_yasg/openapi or Faker at startup.
+API_DOCS_ENABLED = env.bool('API_DOCS_ENABLED', default=DEBUG)
+SEED_APPS_ENABLED = env.bool('SEED_APPS_ENABLED', default=DEBUG)
+
+# Seconds to cache the generated OpenAPI schema (0 rebuilds it per request)
+API_DOCS_CACHE_TIMEOUT = env.int('API_DOCS_CACHE_TIMEOUT', default=60 * 60)
+
+if API_DOCS_ENABLED:
+    INSTALLED_APPS.insert(1, 'drf_yasg')
+
+if SEED_APPS_ENABLED:
+    INSTALLED_APPS.insert(INSTALLED_APPS.index('listings'), 'django_seed')
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'listings.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'listings.middleware.ReplicaPinningMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -90,6 +106,102 @@ DATABASES = {
     'default': env.db()
 }
 
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    # Test against a file: in-memory SQLite fails concurrent writers with
+    # "table is locked" instead of waiting, which breaks threaded tests
+    DATABASES['default']['TEST'] = {'NAME': BASE_DIR / 'test_db.sqlite3'}
+
+# Read replicas
+# Comma-separated database URLs, exposed as the aliases replica1, replica2...
+# Listing and Review reads go to a random replica; a client that writes a
+# booking or review reads from the primary for REPLICA_STICKY_SECONDS.
+
+DATABASE_REPLICAS = []
+for index, url in enumerate(env.list('REPLICA_DATABASE_URLS', default=[]), start=1):
+    alias = f'replica{index}'
+    DATABASES[alias] = environ.Env.db_url_config(url)
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    DATABASE_REPLICAS.append(alias)
+
+REPLICA_STICKY_SECONDS = env.int('REPLICA_STICKY_SECONDS', default=5)
+
+if sys.argv[1:2] == ['test']:
+    # The test run always gets its own second SQLite database as replica1
+    # (instead of any configured replica, which would only mirror the test
+    # primary), so routing tests can tell the two apart. Nothing routes to
+    # it unless a test overrides DATABASE_REPLICAS.
+    for alias in DATABASE_REPLICAS:
+        del DATABASES[alias]
+    DATABASE_REPLICAS = []
+    DATABASES['replica1'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'replica.sqlite3',
+        'TEST': {'NAME': BASE_DIR / 'test_replica.sqlite3'},
+    }
+
+DATABASE_ROUTERS = ['listings.routers.ReplicaRouter']
+
+
+# Cache
+# API throttle buckets (listings/throttling.py) and pending helpful-vote
+# counts (listings/counters.py) live in the default cache. A shared backend
+# is required in production: set CACHE_URL (e.g. redis://host:6379/1, which
+# needs the redis package). The local-memory fallback is per process, so
+# throttle limits multiply by the number of workers.
+
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+
+# Django REST Framework
+# Clients can ask for the compact MessagePack renderer with
+# `Accept: application/msgpack`; JSON stays the default.
+# Throttles use a token bucket in the default cache (listings/throttling.py).
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'listings.renderers.MessagePackRenderer',
+    ],
+    # Views opt in with `throttle_scope`; `<scope>_anon` applies per IP to
+    # anonymous clients, `<scope>` per user to authenticated ones
+    'DEFAULT_THROTTLE_CLASSES': [
+        'listings.throttling.ScopedTokenBucketThrottle',
+    ],
+    # Trusted reverse proxies in front of the app. Anonymous clients are
+    # throttled by IP: with 0, X-Forwarded-For is ignored (a client could
+    # rotate it to get a fresh bucket per request) and REMOTE_ADDR is used;
+    # with N, the Nth address from the right of X-Forwarded-For.
+    'NUM_PROXIES': env.int('NUM_PROXIES', default=0),
+    'DEFAULT_THROTTLE_RATES': {
+        'search': '120/min',
+        'search_anon': '30/min',
+        'reviews': '30/min',
+        'bookings': '20/min',
+    },
+}
+
+
+# Bookings
+
+# Completed/cancelled bookings whose check-out is older than this many days
+# are moved to the archive table by `manage.py archive_bookings`
+BOOKING_ARCHIVE_AFTER_DAYS = env.int('BOOKING_ARCHIVE_AFTER_DAYS', default=365)
+
+
+# Outbox change feed
+
+# Outbox readers wait this many seconds for a missing event id to commit
+# before skipping it as rolled back. Must exceed the longest transaction
+# that writes Listing, Booking or Review rows (bulk cancellation and
+# archival included) plus any clock skew between app servers
+OUTBOX_GAP_TIMEOUT = env.int('OUTBOX_GAP_TIMEOUT', default=60)
+
+# Processed events older than this many days are removed by compact_outbox
+OUTBOX_RETENTION_DAYS = env.int('OUTBOX_RETENTION_DAYS', default=7)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
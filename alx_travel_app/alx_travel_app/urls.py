@@ -14,32 +14,24 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include, re_path
-from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
-
-# Swagger documentation
-#schema_view to configure the api documentation
-schema_view = get_schema_view(
-    openapi.Info(
-        title="ALX_TRAVEL_APP API DOCUMENTATION",
-        default_version='v1',
-        description='API documentation generated by Swagger',
-        terms_of_service='https:www.google.com/policies/terms',
-        contact=openapi.Contact(email='williamnyamu08@gmail.com'),
-        license=openapi.License("BSD License"),
-    ),
-    public=True,
-    permission_classes=(permissions.AllowAny)
-)
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-
-    # Swagger url config
-    path('swagger<format>/', schema_view.without_ui(cache_timeout=0), name='schema-json'),
-    path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='swagger'), # The default and main one to use
-    path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
+    path('api/', include('listings.urls')),
 ]
+
+# Swagger documentation
+# The schema views are built on first request (see api_docs.py) so drf_yasg
+# is not imported when the URLconf loads
+if settings.API_DOCS_ENABLED:
+    from .api_docs import lazy_docs_view
+
+    urlpatterns += [
+        # Swagger url config
+        path('swagger<format>/', lazy_docs_view(), name='schema-json'),
+        path('swagger/', lazy_docs_view('swagger'), name='swagger'), # The default and main one to use
+        path('redoc/', lazy_docs_view('redoc'), name='schema-redoc'),
+    ]
@@ -0,0 +1,114 @@
+"""
+Archival of old completed and cancelled bookings.
+
+Bookings whose check-out is older than BOOKING_ARCHIVE_AFTER_DAYS are moved
+from Booking to ArchivedBooking in chunked transactions. Their reviews are
+re-pointed at the archived row in the same transaction, so they stay
+readable through Review.stay. Archived bookings get an 'archived' outbox
+event rather than 'deleted', so feed consumers don't purge them.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Value
+from django.utils import timezone
+
+from .models import ArchivedBooking, Booking, Review
+from .outbox import record_events
+
+ARCHIVABLE_STATUSES = ['completed', 'cancelled']
+ARCHIVE_CHUNK_SIZE = 1000
+
+# Columns copied verbatim from Booking to ArchivedBooking
+ARCHIVE_FIELDS = [field.attname for field in Booking._meta.concrete_fields]
+
+# Columns shared by both tables, for guest history that spans them
+HISTORY_FIELDS = [
+    'id', 'listing_id', 'confirmation_code', 'check_in_date', 'check_out_date',
+    'nights', 'total_price', 'booking_status', 'payment_status', 'created_at'
+]
+
+
+def archive_cutoff(older_than_days=None, today=None):
+    if older_than_days is None:
+        older_than_days = getattr(settings, 'BOOKING_ARCHIVE_AFTER_DAYS', 365)
+    today = today or timezone.now().date()
+    return today - timedelta(days=older_than_days)
+
+
+def archivable_bookings(cutoff):
+    return Booking.objects.filter(
+        booking_status__in=ARCHIVABLE_STATUSES,
+        check_out_date__lt=cutoff,
+    )
+
+
+def archive_chunk(cutoff, chunk_size=ARCHIVE_CHUNK_SIZE):
+    """Move one chunk of archivable bookings; returns how many were moved"""
+    with transaction.atomic():
+        ids = list(
+            archivable_bookings(cutoff)
+            .select_for_update()
+            .order_by('pk')
+            .values_list('pk', flat=True)[:chunk_size]
+        )
+        if not ids:
+            return 0
+
+        rows = Booking.objects.filter(pk__in=ids).order_by().values(*ARCHIVE_FIELDS)
+        ArchivedBooking.objects.bulk_create(ArchivedBooking(**row) for row in rows)
+
+        reviews = Review.objects.filter(booking_id__in=ids)
+        review_ids = list(reviews.order_by().values_list('pk', flat=True))
+        # Assignment order matters: copy the id before clearing it (MySQL
+        # evaluates SET clauses left to right)
+        reviews.update(
+            archived_booking_id=F('booking_id'),
+            booking_id=None,
+        )
+        record_events(Review, review_ids)
+        record_events(Booking, ids, event_type='archived')
+        # Nothing references these rows any more, so skip the collector:
+        # Booking's post_delete receiver would load every row and record a
+        # 'deleted' event one INSERT at a time
+        archived = Booking.objects.filter(pk__in=ids)
+        archived._raw_delete(archived.db)
+    return len(ids)
+
+
+def archive_bookings(older_than_days=None, chunk_size=ARCHIVE_CHUNK_SIZE, max_chunks=None):
+    """Archive bookings past the horizon, one transaction per chunk"""
+    cutoff = archive_cutoff(older_than_days)
+    total = 0
+    chunks = 0
+    while max_chunks is None or chunks < max_chunks:
+        moved = archive_chunk(cutoff, chunk_size)
+        if not moved:
+            break
+        total += moved
+        chunks += 1
+    return total
+
+
+def guest_booking_history(guest, include_archived=False):
+    """
+    A guest's bookings as dicts, newest stay first.
+    Archived rows are only unioned in when include_archived is set.
+    """
+    hot = (
+        Booking.objects.filter(guest=guest)
+        .order_by()
+        .values(*HISTORY_FIELDS)
+        .annotate(archived=Value(False))
+    )
+    if not include_archived:
+        return hot.order_by('-check_in_date', '-id')
+
+    cold = (
+        ArchivedBooking.objects.filter(guest=guest)
+        .order_by()
+        .values(*HISTORY_FIELDS)
+        .annotate(archived=Value(True))
+    )
+    return hot.union(cold, all=True).order_by('-check_in_date', '-id')
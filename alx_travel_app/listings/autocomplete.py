@@ -0,0 +1,128 @@
+"""
+Search-as-you-type destination autocomplete.
+
+Each worker keeps a sorted array of the distinct city, country and
+neighborhood values of active listings, weighted by how many active
+listings use them. A prefix lookup is a binary search plus a short scan, so
+suggestions are served without touching the database. The index is built
+on first use, kept current by Listing save/delete signals (see signals.py)
+and fully rebuilt every AUTOCOMPLETE_REBUILD_SECONDS to pick up writes
+made by other workers.
+"""
+import heapq
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from collections import Counter
+
+from django.conf import settings
+from django.db.models import Count
+
+from .models import Listing
+
+FIELDS = ['city', 'country', 'neighborhood']
+# One- and two-letter prefixes match a large share of the index, so their
+# results are memoized until the index changes
+MEMO_PREFIX_LENGTH = 2
+MEMO_MAX_ENTRIES = 4096
+
+
+def normalize(value):
+    """Case- and accent-insensitive form used for matching"""
+    decomposed = unicodedata.normalize('NFKD', value.strip())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+
+class DestinationIndex:
+    """Sorted prefix index over listing destinations"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Sorted (normalized, field, value) tuples; entries are kept when
+        # their count drops to zero and skipped at lookup
+        self.keys = []
+        self.counts = Counter()
+        self.built_at = None
+        self._memo = {}
+
+    @property
+    def is_built(self):
+        return self.built_at is not None
+
+    def rebuild(self):
+        counts = Counter()
+        for field in FIELDS:
+            rows = (
+                Listing.objects.filter(status='active')
+                .exclude(**{field: ''})
+                .order_by()
+                .values_list(field)
+                .annotate(count=Count('id'))
+            )
+            for value, count in rows:
+                counts[(field, value)] = count
+        keys = sorted((normalize(value), field, value) for field, value in counts)
+        with self._lock:
+            self.keys = keys
+            self.counts = counts
+            self.built_at = time.monotonic()
+            self._memo = {}
+
+    def _adjust(self, field, value, delta):
+        if not value:
+            return
+        key = (field, value)
+        self._memo = {}
+        if key not in self.counts:
+            insort(self.keys, (normalize(value), field, value))
+        self.counts[key] = max(self.counts[key] + delta, 0)
+
+    def add_listing(self, values):
+        """Count an active listing's {field: value} destinations"""
+        with self._lock:
+            for field in FIELDS:
+                self._adjust(field, values.get(field), 1)
+
+    def remove_listing(self, values):
+        with self._lock:
+            for field in FIELDS:
+                self._adjust(field, values.get(field), -1)
+
+    def suggest(self, prefix, limit=8, fields=None):
+        """Top `limit` destinations starting with prefix, by active listing count"""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        memo_key = (prefix, limit, tuple(fields) if fields else None)
+        with self._lock:
+            if memo_key in self._memo:
+                return self._memo[memo_key]
+            memo = self._memo
+            matches = []
+            for position in range(bisect_left(self.keys, (prefix,)), len(self.keys)):
+                normalized, field, value = self.keys[position]
+                if not normalized.startswith(prefix):
+                    break
+                count = self.counts[(field, value)]
+                if count and (fields is None or field in fields):
+                    matches.append((count, field, value))
+        best = heapq.nlargest(limit, matches, key=lambda match: match[0])
+        suggestions = [{'value': value, 'kind': field, 'listings': count} for count, field, value in best]
+        # Only memoize into the dict we read from, so a concurrent change
+        # (which swaps in a fresh dict) is never hidden by a stale result
+        if len(prefix) <= MEMO_PREFIX_LENGTH and len(memo) < MEMO_MAX_ENTRIES:
+            memo[memo_key] = suggestions
+        return suggestions
+
+
+destination_index = DestinationIndex()
+
+
+def get_destination_index():
+    """The worker's index, (re)built when missing or stale"""
+    max_age = getattr(settings, 'AUTOCOMPLETE_REBUILD_SECONDS', 300)
+    built_at = destination_index.built_at
+    if built_at is None or time.monotonic() - built_at >= max_age:
+        destination_index.rebuild()
+    return destination_index
@@ -0,0 +1,196 @@
+"""
+Booking cancellation and refunds.
+
+`Listing.cancellation_policy` is parsed into refund rules: either one of
+the named policies below, or a custom rule string such as "14:100,7:50"
+(full refund 14+ days before check-in, half refund 7+ days before,
+nothing after). Policies are validated when a listing is written; a stored
+policy that still cannot be parsed falls back to FALLBACK_POLICY (logged),
+so guests can always cancel. Bookings are cancelled in batches with one UPDATE per
+batch, the refund for each row computed in SQL, inside a single
+transaction, together with their outbox events. Only pending/confirmed
+bookings occupy a listing's dates, so cancelling a booking frees them.
+"""
+import logging
+from decimal import Decimal
+from functools import lru_cache
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, Value, When
+from django.db.models.functions import Round
+from django.utils import timezone
+
+from .models import Booking
+from .outbox import record_events
+
+logger = logging.getLogger(__name__)
+
+CANCELLABLE_STATUSES = ['pending', 'confirmed']
+CANCEL_BATCH_SIZE = 500
+
+# Policy name -> ((minimum days before check-in, refund percent), ...)
+NAMED_POLICIES = {
+    'flexible': ((1, 100), (0, 0)),
+    'moderate': ((5, 100), (0, 50)),
+    'strict': ((14, 100), (7, 50), (0, 0)),
+    'non_refundable': ((0, 0),),
+}
+# Applied to stored policies that cannot be parsed (Listing's default policy)
+FALLBACK_POLICY = 'flexible'
+
+class CancellationError(Exception):
+    pass
+
+
+@lru_cache(maxsize=256)
+def parse_policy(policy):
+    """
+    Refund rules for a policy string, ordered by days descending.
+    Raises CancellationError for a policy that cannot be parsed.
+    """
+    name = (policy or '').strip().lower()
+    if name in NAMED_POLICIES:
+        return NAMED_POLICIES[name]
+
+    rules = []
+    try:
+        for rule in name.split(','):
+            days, percent = rule.split(':')
+            rules.append((int(days), int(percent)))
+    except ValueError:
+        raise CancellationError(f"Unknown cancellation policy: {policy!r}")
+    if not all(days >= 0 and 0 <= percent <= 100 for days, percent in rules):
+        raise CancellationError(f"Invalid cancellation policy: {policy!r}")
+    return tuple(sorted(rules, reverse=True))
+
+
+@lru_cache(maxsize=256)
+def policy_rules(policy):
+    """Refund rules for a stored policy, falling back to FALLBACK_POLICY"""
+    try:
+        return parse_policy(policy)
+    except CancellationError:
+        logger.warning('Unparseable cancellation policy %r; applying %r', policy, FALLBACK_POLICY)
+        return NAMED_POLICIES[FALLBACK_POLICY]
+
+
+def refund_percent(policy, check_in_date, initiated_by='guest', today=None):
+    """Share of the price refunded when cancelling now"""
+    # Hosts cancelling on their guests always refund in full
+    if initiated_by == 'host':
+        return 100
+    today = today or timezone.now().date()
+    days_before = (check_in_date - today).days
+    for min_days, percent in policy_rules(policy):
+        if days_before >= min_days:
+            return percent
+    return 0
+
+
+def compute_refund(booking, initiated_by='guest', today=None):
+    """Amount refunded if the booking were cancelled now (refund preview)"""
+    if booking.payment_status != 'paid':
+        return Decimal('0.00')
+    percent = refund_percent(
+        booking.listing.cancellation_policy, booking.check_in_date, initiated_by, today
+    )
+    return (booking.total_price * percent / 100).quantize(Decimal('0.01'))
+
+
+def _refund_expression(percent):
+    amount = DecimalField(max_digits=10, decimal_places=2)
+    return ExpressionWrapper(
+        Round(F('total_price') * Value(Decimal(percent) / 100), 2), output_field=amount
+    )
+
+
+def _cancel_batch(booking_ids, reason, initiated_by, now):
+    rows = (
+        Booking.objects.filter(pk__in=booking_ids, booking_status__in=CANCELLABLE_STATUSES)
+        # Lock only the bookings, not the joined listings
+        .select_for_update(of=('self',))
+        .order_by()
+        .values_list('pk', 'check_in_date', 'listing__cancellation_policy')
+    )
+    by_percent = {}
+    for pk, check_in_date, policy in rows:
+        percent = refund_percent(policy, check_in_date, initiated_by, now.date())
+        by_percent.setdefault(percent, []).append(pk)
+    if not by_percent:
+        return []
+
+    refund = Case(
+        *(When(pk__in=pks, then=_refund_expression(percent)) for percent, pks in by_percent.items()),
+        output_field=DecimalField(max_digits=10, decimal_places=2)
+    )
+    cancelled_ids = [pk for pks in by_percent.values() for pk in pks]
+    is_paid = When(payment_status='paid', then=refund)
+    Booking.objects.filter(pk__in=cancelled_ids).update(
+        booking_status='cancelled',
+        cancelled_at=now,
+        cancellation_reason=reason,
+        # Assigned before payment_status (MySQL applies SET clauses in order)
+        # so it sees whether the booking was paid
+        refund_amount=Case(is_paid, default=Value(Decimal('0.00'))),
+        payment_status=Case(
+            *(
+                When(pk__in=pks, payment_status='paid', then=Value('refunded'))
+                for percent, pks in by_percent.items() if percent > 0
+            ),
+            default=F('payment_status')
+        ),
+        updated_at=now,
+    )
+    return cancelled_ids
+
+
+def cancel_bookings(booking_ids, reason='', initiated_by='guest', batch_size=CANCEL_BATCH_SIZE):
+    """
+    Cancel the given bookings in one transaction, one UPDATE per batch.
+    Bookings that are not pending/confirmed are skipped. Returns the ids
+    of the bookings cancelled.
+    """
+    booking_ids = list(booking_ids)
+    now = timezone.now()
+    cancelled = []
+    with transaction.atomic():
+        for start in range(0, len(booking_ids), batch_size):
+            cancelled.extend(_cancel_batch(booking_ids[start:start + batch_size], reason, initiated_by, now))
+        # No per-worker cache (search snapshot, autocomplete, similar
+        # listings) depends on bookings; anything downstream that does
+        # learns about the cancellations from these outbox events
+        record_events(Booking, cancelled)
+    return cancelled
+
+
+def cancel_booking(booking, reason='', initiated_by='guest'):
+    """Cancel one booking; returns it reloaded with its refund"""
+    if booking.booking_status not in CANCELLABLE_STATUSES:
+        raise CancellationError(f"Cannot cancel a {booking.booking_status} booking")
+    cancel_bookings([booking.pk], reason, initiated_by)
+    booking.refresh_from_db()
+    return booking
+
+
+def cancel_future_bookings(listing, reason='', delist=False):
+    """
+    Host-initiated cancellation of every upcoming booking of a listing,
+    optionally delisting it (inactive and unavailable, so it drops out of
+    search, autocomplete and similar listings) in the same transaction.
+    """
+    with transaction.atomic():
+        booking_ids = (
+            Booking.objects.filter(
+                listing=listing,
+                booking_status__in=CANCELLABLE_STATUSES,
+                check_in_date__gte=timezone.now().date(),
+            )
+            .order_by()
+            .values_list('pk', flat=True)
+        )
+        cancelled = cancel_bookings(booking_ids, reason, initiated_by='host')
+        if delist and (listing.is_available or listing.status != 'inactive'):
+            listing.is_available = False
+            listing.status = 'inactive'
+            listing.save(update_fields=['is_available', 'status', 'updated_at'])
+    return cancelled
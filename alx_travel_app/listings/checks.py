@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+LOCAL_CACHE_BACKENDS = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+@register(deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """Throttles and helpful-vote counts need a cache shared by all workers"""
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if backend in LOCAL_CACHE_BACKENDS:
+        return [
+            Warning(
+                'The default cache is not shared between processes, so API '
+                'throttle limits apply per worker and pending helpful votes '
+                'are only visible to the worker that recorded them.',
+                hint='Set CACHE_URL to a Redis or Memcached instance.',
+                id='listings.W001',
+            )
+        ]
+    return []
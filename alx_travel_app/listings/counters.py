@@ -0,0 +1,281 @@
+"""
+Write-behind counter for Review.helpful_count.
+
+Helpful votes are deduplicated by the HelpfulVote table, but the counter
+itself is not bumped with a read-modify-write save. Each vote increments a
+pending counter in the default cache (atomic incr), and a flush drains the
+pending counters into the database as F() expression updates, one UPDATE
+per distinct delta. Flushes run when HELPFUL_COUNT_FLUSH_THRESHOLD votes
+were recorded in a worker, on a background timer at most
+HELPFUL_COUNT_FLUSH_INTERVAL seconds after its first pending vote, and at
+exit.
+
+Pending counters live only in the cache, not in worker memory, so any
+worker's flush drains every review voted on since the previous flush
+(found through HelpfulVote.created_at), including votes recorded by a
+worker that was killed. A cache lock lets one flush run at a time. Pending
+keys expire HELPFUL_COUNT_PENDING_TTL seconds after their last vote, and
+`manage.py reconcile_helpful_counts` recomputes helpful_count from the
+HelpfulVote rows to repair any drift (e.g. a cache restart).
+
+With a shared cache backend (CACHE_URL, see settings.py) reads from any
+worker include pending votes; with the local-memory fallback only the
+voting worker's do.
+"""
+import atexit
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, connections, transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import HelpfulVote, Review
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = 'helpful_count:pending:{}'
+FLUSH_LOCK_KEY = 'helpful_count:flush_lock'
+DRAINED_AT_KEY = 'helpful_count:drained_at'
+FLUSH_LOCK_TIMEOUT = 60
+# Votes from shortly before the previous flush are checked again, in case
+# their cache increment landed after that flush read the counters
+DRAIN_OVERLAP = timedelta(seconds=60)
+RECONCILE_BATCH_SIZE = 1000
+
+
+def _pending_key(review_id):
+    return PENDING_KEY.format(review_id)
+
+
+@contextmanager
+def flush_lock(wait=0):
+    """Hold the cross-worker flush lock; yields False if it could not be taken"""
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + wait
+    acquired = cache.add(FLUSH_LOCK_KEY, token, timeout=FLUSH_LOCK_TIMEOUT)
+    while not acquired and time.monotonic() < deadline:
+        time.sleep(0.1)
+        acquired = cache.add(FLUSH_LOCK_KEY, token, timeout=FLUSH_LOCK_TIMEOUT)
+    try:
+        yield acquired
+    finally:
+        if acquired and cache.get(FLUSH_LOCK_KEY) == token:
+            cache.delete(FLUSH_LOCK_KEY)
+
+
+class HelpfulCountBuffer:
+    """Pending helpful_count increments in the cache, flushed in batches"""
+
+    def __init__(self, flush_interval=None, flush_threshold=None, pending_ttl=None):
+        self.flush_interval = (
+            flush_interval if flush_interval is not None
+            else getattr(settings, 'HELPFUL_COUNT_FLUSH_INTERVAL', 5)
+        )
+        self.flush_threshold = (
+            flush_threshold if flush_threshold is not None
+            else getattr(settings, 'HELPFUL_COUNT_FLUSH_THRESHOLD', 500)
+        )
+        self.pending_ttl = (
+            pending_ttl if pending_ttl is not None
+            else getattr(settings, 'HELPFUL_COUNT_PENDING_TTL', 60 * 60)
+        )
+        self._lock = threading.Lock()
+        self._buffered = 0
+        self._last_flush = time.monotonic()
+        self._timer = None
+
+    def _schedule_flush(self):
+        """Start the flush timer unless one is pending; call with the lock held"""
+        if self._timer is None:
+            self._timer = threading.Timer(self.flush_interval, self._timed_flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _timed_flush(self):
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        except Exception:
+            # flush() put the deltas back; try again after another interval
+            logger.exception('Flushing helpful counts failed')
+            with self._lock:
+                self._schedule_flush()
+        finally:
+            # The timer thread opened its own connections; don't leak them
+            connections.close_all()
+
+    def incr(self, review_id, amount=1):
+        """Record a pending increment and flush if the interval or threshold is hit"""
+        key = _pending_key(review_id)
+        try:
+            cache.incr(key, amount)
+            # Expire pending keys relative to their latest vote
+            cache.touch(key, self.pending_ttl)
+        except ValueError:
+            # Key missing (first pending vote or expired); add() is atomic
+            if not cache.add(key, amount, timeout=self.pending_ttl):
+                cache.incr(key, amount)
+
+        with self._lock:
+            self._buffered += amount
+            due = (
+                self._buffered >= self.flush_threshold
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+            if not due:
+                self._schedule_flush()
+        if due:
+            self.flush()
+
+    def pending(self, review_id):
+        """Increments not yet written to the database, across all workers"""
+        return cache.get(_pending_key(review_id), 0)
+
+    def pending_many(self, review_ids):
+        keys = {_pending_key(review_id): review_id for review_id in review_ids}
+        found = cache.get_many(keys.keys())
+        return {keys[key]: value for key, value in found.items()}
+
+    def _recently_voted(self):
+        """Reviews that may have pending increments"""
+        horizon = timezone.now() - timedelta(seconds=self.pending_ttl)
+        drained_at = cache.get(DRAINED_AT_KEY)
+        since = max(drained_at - DRAIN_OVERLAP, horizon) if drained_at else horizon
+        return (
+            HelpfulVote.objects.filter(created_at__gte=since)
+            .order_by()
+            .values_list('review_id', flat=True)
+            .distinct()
+        )
+
+    def _restore(self, deltas):
+        for review_id, delta in deltas.items():
+            key = _pending_key(review_id)
+            try:
+                cache.incr(key, delta)
+            except ValueError:
+                cache.add(key, delta, timeout=self.pending_ttl)
+
+    def _drain(self):
+        started = timezone.now()
+        pending = self.pending_many(list(self._recently_voted()))
+        deltas = {review_id: delta for review_id, delta in pending.items() if delta > 0}
+        # Take the deltas out of the cache before writing them; votes that
+        # arrive meanwhile stay pending for the next flush
+        for review_id, delta in deltas.items():
+            try:
+                cache.decr(_pending_key(review_id), delta)
+            except ValueError:
+                pass
+
+        by_delta = {}
+        for review_id, delta in deltas.items():
+            by_delta.setdefault(delta, []).append(review_id)
+        try:
+            with transaction.atomic():
+                for delta, review_ids in by_delta.items():
+                    Review.objects.filter(pk__in=review_ids).update(
+                        helpful_count=F('helpful_count') + delta
+                    )
+        except Exception:
+            self._restore(deltas)
+            raise
+        cache.set(DRAINED_AT_KEY, started, timeout=None)
+        return len(deltas)
+
+    def flush(self):
+        """
+        Drain pending increments into helpful_count. Returns the number of
+        reviews updated; 0 (with a retry scheduled) if another worker is
+        flushing.
+        """
+        with self._lock:
+            self._buffered = 0
+            self._last_flush = time.monotonic()
+        with flush_lock() as acquired:
+            if acquired:
+                return self._drain()
+        # The running flush may have missed this worker's latest votes
+        with self._lock:
+            self._schedule_flush()
+        return 0
+
+
+helpful_counts = HelpfulCountBuffer()
+atexit.register(helpful_counts.flush)
+
+
+def reconcile_helpful_counts(batch_size=RECONCILE_BATCH_SIZE, wait=FLUSH_LOCK_TIMEOUT):
+    """
+    Flush pending increments, then reset helpful_count to the number of
+    HelpfulVote rows wherever the two disagree and clear those reviews'
+    pending keys. Returns the ids of the reviews corrected.
+    """
+    votes = (
+        HelpfulVote.objects.filter(review=OuterRef('pk'))
+        .order_by()
+        .values('review')
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    vote_count = Coalesce(Subquery(votes, output_field=IntegerField()), Value(0))
+    corrected = []
+    with flush_lock(wait=wait) as acquired:
+        if not acquired:
+            raise RuntimeError('Could not take the helpful count flush lock')
+        helpful_counts._drain()
+        last_pk = 0
+        while True:
+            batch = list(
+                Review.objects.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1]
+            drifted = list(
+                Review.objects.filter(pk__in=batch)
+                .annotate(vote_count=vote_count)
+                .exclude(helpful_count=F('vote_count'))
+                .values_list('pk', flat=True)
+            )
+            if drifted:
+                Review.objects.filter(pk__in=drifted).update(helpful_count=vote_count)
+                cache.delete_many([_pending_key(review_id) for review_id in drifted])
+                corrected.extend(drifted)
+    return corrected
+
+
+def record_helpful_vote(review, user):
+    """
+    Record a helpful vote from user on review.
+    Returns False if the user already voted for this review.
+    """
+    try:
+        with transaction.atomic():
+            HelpfulVote.objects.create(review=review, voter=user)
+    except IntegrityError:
+        return False
+    helpful_counts.incr(review.pk)
+    return True
+
+
+def get_helpful_count(review):
+    """Stored helpful_count plus increments still waiting to be flushed"""
+    return review.helpful_count + helpful_counts.pending(review.pk)
+
+
+def get_helpful_counts(reviews):
+    """{review id: helpful count} for many reviews with one cache read"""
+    pending = helpful_counts.pending_many([review.pk for review in reviews])
+    return {review.pk: review.helpful_count + pending.get(review.pk, 0) for review in reviews}
@@ -0,0 +1,126 @@
+"""
+Streaming CSV/NDJSON exports of bookings and reviews.
+
+Rows are pulled with .values_list().iterator(chunk_size=...) so no model
+instances or serializers are built, and output is yielded in small blocks,
+keeping memory flat regardless of how many rows are exported.
+
+Archived bookings are still part of the books: the bookings export unions
+Booking with ArchivedBooking (flagged by the `archived` column), and reviews
+of archived stays carry archived_booking_id and match status filters.
+"""
+import csv
+from datetime import datetime, time, timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q, Value
+from django.utils import timezone
+
+from .models import ArchivedBooking, Booking, Review
+
+EXPORT_CHUNK_SIZE = 2000
+# Flush the output buffer to the client once it grows past this many bytes
+EXPORT_BLOCK_SIZE = 64 * 1024
+
+# Each export reads its sources (model, extra annotations) in id order;
+# several sources are combined with UNION ALL
+EXPORTS = {
+    'bookings': {
+        'sources': [
+            (Booking, {'archived': Value(False)}),
+            (ArchivedBooking, {'archived': Value(True)}),
+        ],
+        'fields': [
+            'id', 'confirmation_code', 'listing_id', 'guest_id',
+            'check_in_date', 'check_out_date', 'nights',
+            'number_of_adults', 'number_of_children', 'number_of_infants',
+            'booking_status', 'total_price', 'payment_status', 'payment_method',
+            'cancelled_at', 'refund_amount', 'created_at', 'updated_at', 'archived'
+        ],
+        'status_fields': ['booking_status'],
+    },
+    'reviews': {
+        'sources': [(Review, {})],
+        'fields': [
+            'id', 'listing_id', 'booking_id', 'archived_booking_id', 'reviewer_id',
+            'overall_rating', 'cleanliness_rating', 'accuracy_rating',
+            'communication_rating', 'location_rating', 'value_rating', 'checkin_rating',
+            'helpful_count', 'is_verified', 'host_response_date',
+            'created_at', 'updated_at'
+        ],
+        'status_fields': ['booking__booking_status', 'archived_booking__booking_status'],
+    },
+}
+
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def export_queryset(name, start=None, end=None, status=None):
+    """
+    Filtered values_list queryset for an export, in id order.
+    start and end are inclusive dates, compared as datetime bounds so an
+    index on created_at stays usable.
+    """
+    spec = EXPORTS[name]
+    querysets = []
+    for model, annotations in spec['sources']:
+        queryset = model.objects.all()
+        if start is not None:
+            queryset = queryset.filter(created_at__gte=_day_start(start))
+        if end is not None:
+            queryset = queryset.filter(created_at__lt=_day_start(end + timedelta(days=1)))
+        if status:
+            matches = Q()
+            for field in spec['status_fields']:
+                matches |= Q(**{field: status})
+            queryset = queryset.filter(matches)
+        querysets.append(queryset.order_by().annotate(**annotations).values_list(*spec['fields']))
+    first, *rest = querysets
+    return first.union(*rest, all=True).order_by('id') if rest else first.order_by('id')
+
+
+class _Echo:
+    """File-like object whose write() just returns the value, for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def _csv_lines(fields, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def _ndjson_lines(fields, rows):
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    for row in rows:
+        yield encoder.encode(dict(zip(fields, row))) + '\n'
+
+
+def stream_export(name, fmt='csv', start=None, end=None, status=None,
+                  chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield the export as text blocks of roughly EXPORT_BLOCK_SIZE bytes"""
+    fields = EXPORTS[name]['fields']
+    rows = export_queryset(name, start, end, status).iterator(chunk_size=chunk_size)
+    lines = _csv_lines(fields, rows) if fmt == 'csv' else _ndjson_lines(fields, rows)
+
+    block = []
+    size = 0
+    for line in lines:
+        block.append(line)
+        size += len(line)
+        if size >= EXPORT_BLOCK_SIZE:
+            yield ''.join(block)
+            block = []
+            size = 0
+    if block:
+        yield ''.join(block)
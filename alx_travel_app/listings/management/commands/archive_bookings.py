@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from listings.archive import ARCHIVE_CHUNK_SIZE, archivable_bookings, archive_bookings, archive_cutoff
+
+
+class Command(BaseCommand):
+    help = 'Move old completed/cancelled bookings into the archive table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, help='Archive horizon (default: BOOKING_ARCHIVE_AFTER_DAYS)')
+        parser.add_argument('--chunk-size', type=int, default=ARCHIVE_CHUNK_SIZE, help='Bookings moved per transaction')
+        parser.add_argument('--max-chunks', type=int, help='Stop after this many chunks')
+        parser.add_argument('--dry-run', action='store_true', help='Only count archivable bookings')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            cutoff = archive_cutoff(options['older_than_days'])
+            count = archivable_bookings(cutoff).count()
+            self.stdout.write(f"{count} bookings checked out before {cutoff} would be archived")
+            return
+
+        moved = archive_bookings(
+            older_than_days=options['older_than_days'],
+            chunk_size=options['chunk_size'],
+            max_chunks=options['max_chunks'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Archived {moved} bookings"))
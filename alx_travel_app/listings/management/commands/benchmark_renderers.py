@@ -0,0 +1,75 @@
+import gzip
+import random
+import time
+from datetime import time as dt_time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from listings.renderers import MessagePackRenderer
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def build_page(size, coerce_decimals):
+    """A listing page shaped like ListingDetailSerializer output"""
+    now = timezone.now()
+    page = []
+    for i in range(size):
+        row = {
+            'id': i + 1,
+            'title': f'Listing {i}',
+            'property_type': random.choice(['apartment', 'house', 'villa']),
+            'city': 'Nairobi',
+            'country': 'Kenya',
+            'latitude': Decimal(f'{random.uniform(-90, 90):.6f}'),
+            'longitude': Decimal(f'{random.uniform(-180, 180):.6f}'),
+            'base_price': Decimal(f'{random.uniform(50, 500):.2f}'),
+            'max_guests': random.randint(1, 8),
+            'bedrooms': random.randint(1, 5),
+            'bathrooms': Decimal(random.choice(['1.0', '1.5', '2.0'])),
+            'check_in_time': dt_time(15, 0),
+            'check_out_time': dt_time(11, 0),
+            'is_available': True,
+            'average_rating': round(random.uniform(1, 5), 2),
+            'created_at': now,
+            'updated_at': now,
+        }
+        if coerce_decimals:
+            # What DRF hands to the renderer with its default settings
+            for key, value in row.items():
+                if isinstance(value, Decimal):
+                    row[key] = str(value)
+                elif hasattr(value, 'isoformat'):
+                    row[key] = value.isoformat()
+        page.append(row)
+    return {'count': size, 'results': page}
+
+
+class Command(BaseCommand):
+    help = 'Compare size and encode time of the JSON and MessagePack renderers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help='Listings per page')
+        parser.add_argument('--repeat', type=int, default=20, help='Encodes per measurement')
+
+    def handle(self, *args, **options):
+        renderers = [('json', JSONRenderer()), ('msgpack', MessagePackRenderer())]
+        for coerce in (True, False):
+            data = build_page(options['rows'], coerce)
+            label = 'strings (DRF default)' if coerce else 'native Decimal/datetime'
+            self.stdout.write(f"\n{options['rows']} listings, {label}")
+            self.stdout.write(f"{'renderer':<10}{'encode ms':>10}{'bytes':>10}{'gzip':>10}{'brotli':>10}")
+            for name, renderer in renderers:
+                started = time.perf_counter()
+                for _ in range(options['repeat']):
+                    body = renderer.render(data)
+                elapsed = (time.perf_counter() - started) * 1000 / options['repeat']
+                gz = len(gzip.compress(body, compresslevel=6))
+                br = len(brotli.compress(body, quality=5)) if brotli else '-'
+                self.stdout.write(f"{name:<10}{elapsed:>10.2f}{len(body):>10}{gz:>10}{br:>10}")
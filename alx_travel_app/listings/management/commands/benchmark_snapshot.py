@@ -0,0 +1,97 @@
+import random
+import time
+import tracemalloc
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from listings.models import Listing
+from listings.snapshot import ListingSnapshot, get_numpy
+
+
+class Rollback(Exception):
+    pass
+
+
+def measure(func):
+    """Run func and return (result, seconds, peak traced bytes)"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+class Command(BaseCommand):
+    help = 'Compare memory and latency of the listing snapshot against full Listing instances'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=0,
+                            help='Create this many synthetic listings for the run (rolled back afterwards)')
+        parser.add_argument('--queries', type=int, default=50, help='Searches to time')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                if options['rows']:
+                    self.create_listings(options['rows'])
+                self.run(options['queries'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def create_listings(self, rows):
+        host, _ = User.objects.get_or_create(username='snapshot-benchmark-host')
+        cities = [f'City {i}' for i in range(200)]
+        types = [code for code, _ in Listing.PROPERTY_TYPES]
+        batch = []
+        for i in range(rows):
+            batch.append(Listing(
+                title=f'Benchmark listing {i}', description='', property_type=random.choice(types),
+                host=host, address='', city=random.choice(cities), country='Kenya',
+                latitude=round(random.uniform(-4, 4), 6), longitude=round(random.uniform(34, 41), 6),
+                base_price=random.randint(20, 800), max_guests=random.randint(1, 10),
+                bedrooms=random.randint(1, 5),
+            ))
+            if len(batch) == 5000:
+                Listing.objects.bulk_create(batch)
+                batch = []
+        Listing.objects.bulk_create(batch)
+
+    def run(self, queries):
+        snapshot = ListingSnapshot()
+        _, build_time, snapshot_peak = measure(snapshot.rebuild)
+        instances, load_time, orm_peak = measure(lambda: list(Listing.objects.filter(status='active')))
+        del instances
+
+        self.stdout.write(f"{len(snapshot)} active listings (numpy: {'yes' if get_numpy() is not None else 'no'})")
+        self.stdout.write(f"{'':<10}{'load s':>10}{'peak MB':>10}")
+        self.stdout.write(f"{'orm':<10}{load_time:>10.2f}{orm_peak / 2 ** 20:>10.1f}")
+        self.stdout.write(f"{'snapshot':<10}{build_time:>10.2f}{snapshot_peak / 2 ** 20:>10.1f}")
+        self.stdout.write(f"snapshot columns: {snapshot.nbytes() / 2 ** 20:.1f} MB")
+
+        cities = snapshot.cities.values or ['']
+        searches = [
+            {'city': random.choice(cities), 'guests': random.randint(1, 4), 'max_price': random.randint(100, 800)}
+            for _ in range(queries)
+        ]
+
+        started = time.perf_counter()
+        for search in searches:
+            snapshot.search(**search, limit=20)
+        snapshot_ms = (time.perf_counter() - started) * 1000 / queries
+
+        started = time.perf_counter()
+        for search in searches:
+            list(
+                Listing.objects.filter(
+                    status='active', city=search['city'], max_guests__gte=search['guests'],
+                    base_price__lte=search['max_price'],
+                ).prefetch_related('reviews')
+            )
+        orm_ms = (time.perf_counter() - started) * 1000 / queries
+
+        self.stdout.write(f"search latency: orm {orm_ms:.2f} ms, snapshot {snapshot_ms:.3f} ms")
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from listings.recommendations import DEFAULT_NEIGHBORS, build_similar_listings
+
+
+class Command(BaseCommand):
+    help = 'Precompute "similar listings" neighbor lists (incremental unless --full)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--k', type=int, default=DEFAULT_NEIGHBORS, help='Neighbors stored per listing')
+        parser.add_argument('--full', action='store_true', help='Recompute every listing')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            refreshed = build_similar_listings(k=options['k'], full=options['full'])
+        except ImportError as error:
+            raise CommandError(str(error))
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Refreshed similar listings for {refreshed} listings in {elapsed:.2f}s"
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from listings.outbox import compact
+
+
+class Command(BaseCommand):
+    help = 'Delete outbox events that every consumer has processed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-days', type=int, help='Keep events newer than this (default: OUTBOX_RETENTION_DAYS)')
+
+    def handle(self, *args, **options):
+        deleted = compact(options['retention_days'])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} outbox events"))
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+
+from listings.outbox import OUTBOX_BATCH_SIZE, consume
+
+
+class Command(BaseCommand):
+    help = 'Stream outbox events to stdout as NDJSON, checkpointing per consumer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('consumer', help='Consumer name; its checkpoint is stored in the database')
+        parser.add_argument('--batch-size', type=int, default=OUTBOX_BATCH_SIZE, help='Events per batch')
+        parser.add_argument('--types', help='Comma-separated aggregate types (listing,booking,review)')
+        parser.add_argument('--follow', action='store_true', help='Keep polling for new events')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds between polls with --follow')
+
+    def handle(self, *args, **options):
+        encoder = DjangoJSONEncoder(separators=(',', ':'))
+        types = options['types'].split(',') if options['types'] else None
+
+        def write(events):
+            self.stdout.write(''.join(
+                encoder.encode({
+                    'id': event.id,
+                    'aggregate_type': event.aggregate_type,
+                    'aggregate_id': event.aggregate_id,
+                    'event_type': event.event_type,
+                    'payload': event.payload,
+                    'created_at': event.created_at,
+                }) + '\n'
+                for event in events
+            ), ending='')
+            self.stdout.flush()
+
+        while True:
+            handled = consume(options['consumer'], write, options['batch_size'], types)
+            if not options['follow']:
+                self.stderr.write(f"Consumed {handled} events")
+                return
+            if not handled:
+                time.sleep(options['poll_interval'])
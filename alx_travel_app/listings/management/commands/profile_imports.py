@@ -0,0 +1,76 @@
+import os
+import resource
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter so nothing is already imported
+BOOT_SCRIPT = (
+    "import django; django.setup(); "
+    "from django.urls import get_resolver; get_resolver().url_patterns; "
+    "import {wsgi}"
+)
+
+
+def parse_importtime(output):
+    """Self and cumulative microseconds per module from `python -X importtime`"""
+    modules = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+class Command(BaseCommand):
+    help = 'Report per-module import cost of booting a worker (settings, apps, URLconf, WSGI)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=25, help='Number of modules/packages to show')
+        parser.add_argument('--by-package', action='store_true', help='Aggregate self time by top-level package')
+
+    def handle(self, *args, **options):
+        wsgi_module = settings.WSGI_APPLICATION.rsplit('.', 1)[0]
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+
+        started = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', BOOT_SCRIPT.format(wsgi=wsgi_module)],
+            env=env, capture_output=True, text=True
+        )
+        elapsed = time.perf_counter() - started
+        if result.returncode != 0:
+            errors = [
+                line for line in result.stderr.strip().splitlines()
+                if not line.startswith('import time:')
+            ]
+            raise CommandError(errors[-1] if errors else f"Boot exited with status {result.returncode}")
+
+        modules = parse_importtime(result.stderr)
+        # ru_maxrss is reported in kilobytes on Linux
+        peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+
+        if options['by_package']:
+            packages = defaultdict(int)
+            for name, (self_us, _) in modules.items():
+                packages[name.split('.')[0]] += self_us
+            rows = sorted(packages.items(), key=lambda item: item[1], reverse=True)
+            self.stdout.write(f"{'self ms':>10}  package")
+            for name, self_us in rows[:options['top']]:
+                self.stdout.write(f"{self_us / 1000:>10.1f}  {name}")
+        else:
+            rows = sorted(modules.items(), key=lambda item: item[1][1], reverse=True)
+            self.stdout.write(f"{'cumul ms':>10}{'self ms':>10}  module")
+            for name, (self_us, cumulative_us) in rows[:options['top']]:
+                self.stdout.write(f"{cumulative_us / 1000:>10.1f}{self_us / 1000:>10.1f}  {name}")
+
+        total = sum(self_us for self_us, _ in modules.values()) / 1000
+        self.stdout.write(
+            f"\n{len(modules)} modules, {total:.0f} ms importing, "
+            f"{elapsed:.2f}s boot, peak RSS {peak:.1f} MB"
+        )
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from listings.counters import RECONCILE_BATCH_SIZE, reconcile_helpful_counts
+
+
+class Command(BaseCommand):
+    help = 'Flush pending helpful votes and repair helpful_count from the HelpfulVote rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=RECONCILE_BATCH_SIZE, help='Reviews checked per query')
+
+    def handle(self, *args, **options):
+        try:
+            corrected = reconcile_helpful_counts(batch_size=options['batch_size'])
+        except RuntimeError as error:
+            raise CommandError(str(error))
+        self.stdout.write(self.style.SUCCESS(f"Corrected helpful_count on {len(corrected)} reviews"))
@@ -0,0 +1,102 @@
+"""
+Project middleware.
+
+CompressionMiddleware negotiates response compression with Accept-Encoding:
+brotli when the optional `brotli` package is installed and the client
+accepts it, otherwise Django's gzip middleware handles the response.
+
+ReplicaPinningMiddleware keeps a client's reads on the primary database for
+a short window after it writes (see routers.py).
+"""
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+from .routers import pin_to_primary, pinned_by_write, unpin
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+# Compressing tiny bodies costs more CPU than it saves on the wire
+MIN_COMPRESS_LENGTH = 200
+
+
+def accepts_encoding(header, coding):
+    """
+    Whether an Accept-Encoding header allows `coding`, honouring q-values:
+    "br;q=0" refuses brotli, and "*" covers codings not listed explicitly.
+    """
+    wildcard = None
+    for item in header.split(','):
+        name, _, params = item.partition(';')
+        name = name.strip().lower()
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name == coding:
+            return quality > 0
+        if name == '*':
+            wildcard = quality > 0
+    return bool(wildcard)
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """Brotli when available and accepted, gzip otherwise"""
+
+    def process_response(self, request, response):
+        if (
+            brotli is None
+            or not accepts_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''), 'br')
+            or response.streaming
+            or response.has_header('Content-Encoding')
+            or len(response.content) < MIN_COMPRESS_LENGTH
+        ):
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        compressed = brotli.compress(response.content, quality=5)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        # Like gzip, the encoded body is no longer byte-identical: weaken the ETag
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
+
+
+PIN_COOKIE = 'primary_pinned'
+
+
+class ReplicaPinningMiddleware:
+    """Pin reads to the primary for REPLICA_STICKY_SECONDS after a client writes"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'DATABASE_REPLICAS', []):
+            return self.get_response(request)
+
+        token = pin_to_primary('cookie' if PIN_COOKIE in request.COOKIES else None)
+        try:
+            response = self.get_response(request)
+            if pinned_by_write():
+                response.set_cookie(
+                    PIN_COOKIE, '1',
+                    max_age=getattr(settings, 'REPLICA_STICKY_SECONDS', 5),
+                    httponly=True, samesite='Lax'
+                )
+        finally:
+            unpin(token)
+        return response
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-19 09:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0007_outboxevent_archived'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='review',
+            constraint=models.CheckConstraint(condition=models.Q(models.Q(('archived_booking__isnull', True), ('booking__isnull', False)), models.Q(('archived_booking__isnull', False), ('booking__isnull', True)), _connector='OR'), name='review_exactly_one_booking'),
+        ),
+    ]
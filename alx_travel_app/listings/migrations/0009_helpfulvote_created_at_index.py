@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-19 10:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0008_review_exactly_one_booking'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='helpfulvote',
+            index=models.Index(fields=['created_at'], name='listings_he_created_5fa2d0_idx'),
+        ),
+    ]
@@ -4,9 +4,22 @@ from django.db import models
 # Create models: Listing, Booking, Review
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.db import transaction
 
 
-class Listing(models.Model):
+class OutboxMixin:
+    """
+    Wraps save() in a transaction so the OutboxEvent written by the
+    post_save handler (listings/signals.py) commits or rolls back with
+    the row itself.
+    """
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+
+class Listing(OutboxMixin, models.Model):
     PROPERTY_TYPES = [
         ('apartment', 'Apartment'),
         ('house', 'House'),
@@ -68,6 +81,19 @@ class Listing(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+
+    # Columns the destination autocomplete index is derived from
+    DESTINATION_FIELDS = ('city', 'country', 'neighborhood', 'status')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored destination so the index can un-count it
+        # after a save without re-reading the row (listings/signals.py)
+        loaded = dict(zip(field_names, values))
+        if all(field in loaded for field in cls.DESTINATION_FIELDS):
+            instance._stored_destination = {field: loaded[field] for field in cls.DESTINATION_FIELDS}
+        return instance
         
     def __str__(self):
         return self.title
@@ -79,7 +105,7 @@ class Listing(models.Model):
         return 0
 
 
-class Booking(models.Model):
+class Booking(OutboxMixin, models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
         ('confirmed', 'Confirmed'),
@@ -124,6 +150,7 @@ class Booking(models.Model):
     # Cancellation
     cancelled_at = models.DateTimeField(null=True, blank=True)
     cancellation_reason = models.TextField(blank=True)
+    refund_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
@@ -140,10 +167,75 @@ class Booking(models.Model):
         return self.number_of_adults + self.number_of_children + self.number_of_infants
 
 
-class Review(models.Model):
+class ArchivedBooking(models.Model):
+    """
+    Cold storage for old completed/cancelled bookings, moved out of Booking
+    by listings.archive so the hot table and its indexes stay small.
+    Rows keep their original Booking id.
+    """
+    id = models.BigIntegerField(primary_key=True)
+
+    # References
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='archived_bookings')
+    guest = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_bookings')
+    
+    # Dates
+    check_in_date = models.DateField()
+    check_out_date = models.DateField()
+    
+    # Guests
+    number_of_adults = models.PositiveIntegerField(default=1)
+    number_of_children = models.PositiveIntegerField(default=0)
+    number_of_infants = models.PositiveIntegerField(default=0)
+    
+    # Status
+    booking_status = models.CharField(max_length=20, choices=Booking.STATUS_CHOICES)
+    
+    # Pricing
+    total_price = models.DecimalField(max_digits=10, decimal_places=2)
+    nights = models.PositiveIntegerField()
+    
+    # Payment
+    payment_status = models.CharField(max_length=20, choices=Booking.PAYMENT_STATUS_CHOICES)
+    payment_method = models.CharField(max_length=50, blank=True)
+    
+    # Additional
+    special_requests = models.TextField(blank=True)
+    confirmation_code = models.CharField(max_length=20, unique=True)
+    
+    # Cancellation
+    cancelled_at = models.DateTimeField(null=True, blank=True)
+    cancellation_reason = models.TextField(blank=True)
+    refund_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    
+    # Timestamps (copied from the original booking)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['guest', '-check_in_date']),
+        ]
+        
+    def __str__(self):
+        return f"Archived booking {self.confirmation_code}"
+    
+    @property
+    def total_guests(self):
+        return self.number_of_adults + self.number_of_children + self.number_of_infants
+
+
+class Review(OutboxMixin, models.Model):
     # References
     listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='reviews')
-    booking = models.OneToOneField(Booking, on_delete=models.CASCADE, related_name='review')
+    # Exactly one of booking/archived_booking is set; archiving a booking
+    # moves the link to archived_booking
+    booking = models.OneToOneField(Booking, on_delete=models.CASCADE, related_name='review', null=True, blank=True)
+    archived_booking = models.OneToOneField(
+        ArchivedBooking, on_delete=models.CASCADE, related_name='review', null=True, blank=True
+    )
     reviewer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reviews')
     
     # Ratings (1-5 scale)
@@ -187,10 +279,24 @@ class Review(models.Model):
     class Meta:
         ordering = ['-created_at']
         unique_together = ['booking', 'reviewer']  # One review per booking per user
+        constraints = [
+            models.CheckConstraint(
+                condition=(
+                    models.Q(booking__isnull=False, archived_booking__isnull=True)
+                    | models.Q(booking__isnull=True, archived_booking__isnull=False)
+                ),
+                name='review_exactly_one_booking',
+            ),
+        ]
         
     def __str__(self):
         return f"Review by {self.reviewer.username} for {self.listing.title}"
     
+    @property
+    def stay(self):
+        """The reviewed booking, whether it is still hot or archived"""
+        return self.booking if self.booking_id else self.archived_booking
+    
     @property
     def average_rating(self):
         return (
@@ -200,4 +306,98 @@ class Review(models.Model):
             self.location_rating + 
             self.value_rating + 
             self.checkin_rating
-        ) / 6
\ No newline at end of file
+        ) / 6
+
+class HelpfulVote(models.Model):
+    # References
+    review = models.ForeignKey(Review, on_delete=models.CASCADE, related_name='helpful_votes')
+    voter = models.ForeignKey(User, on_delete=models.CASCADE, related_name='helpful_votes')
+
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        unique_together = ['review', 'voter']  # One helpful vote per review per user
+        indexes = [
+            # Flushes look up reviews voted on since the previous flush
+            models.Index(fields=['created_at']),
+        ]
+
+    def __str__(self):
+        return f"Helpful vote by {self.voter.username} on review {self.review_id}"
+
+
+class SimilarListing(models.Model):
+    """
+    Precomputed "similar stays" for a listing, written by the
+    build_similar_listings command (see listings/recommendations.py).
+    """
+    # References
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='similar_listings')
+    similar = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='+')
+    
+    # Ranking (1 is most similar)
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+    
+    # Timestamps
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['listing', 'rank']
+        unique_together = ['listing', 'rank']  # Also the index the detail page reads
+        
+    def __str__(self):
+        return f"#{self.rank} similar to listing {self.listing_id}: {self.similar_id}"
+
+
+class OutboxEvent(models.Model):
+    """
+    Change feed entry appended in the same transaction as a Listing,
+    Booking or Review write. Consumers read events in id order from a
+    cursor (see listings/outbox.py).
+    """
+    AGGREGATE_TYPES = [
+        ('listing', 'Listing'),
+        ('booking', 'Booking'),
+        ('review', 'Review'),
+    ]
+    
+    EVENT_TYPES = [
+        ('created', 'Created'),
+        ('updated', 'Updated'),
+        ('deleted', 'Deleted'),
+        # Booking moved to ArchivedBooking; it still exists there
+        ('archived', 'Archived'),
+    ]
+
+    # Event
+    aggregate_type = models.CharField(max_length=20, choices=AGGREGATE_TYPES)
+    aggregate_id = models.BigIntegerField()
+    event_type = models.CharField(max_length=20, choices=EVENT_TYPES)
+    payload = models.JSONField(default=dict, blank=True)
+    
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['aggregate_type', 'id']),
+        ]
+        
+    def __str__(self):
+        return f"{self.aggregate_type} {self.aggregate_id} {self.event_type}"
+
+
+class OutboxCheckpoint(models.Model):
+    """Last event id processed by each outbox consumer"""
+    consumer = models.CharField(max_length=100, unique=True)
+    position = models.BigIntegerField(default=0)
+    
+    # Timestamps
+    updated_at = models.DateTimeField(auto_now=True)
+        
+    def __str__(self):
+        return f"{self.consumer} at {self.position}"
@@ -0,0 +1,147 @@
+"""
+Transactional outbox: a change feed for Listing, Booking and Review.
+
+Every write appends a compact OutboxEvent in the same transaction: single
+saves and deletes through the signal handlers in signals.py, and bulk
+UPDATE paths (cancellation, archival) through record_events(). Consumers
+read events in id order after a cursor, in batches, and keep a per-consumer
+checkpoint. compact() deletes events every consumer has processed.
+
+Ids are allocated at insert time but transactions commit in any order, so
+a reader could see event N+1 before N commits. Reads therefore stop at the
+first missing id and only skip past it once the event after it is older
+than OUTBOX_GAP_TIMEOUT seconds: by then the transaction that took the
+missing id has rolled back, or the event was compacted away. The timeout
+must exceed the longest write transaction. Contiguous events are served
+as soon as they commit.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from .models import Booking, Listing, OutboxCheckpoint, OutboxEvent, Review
+
+OUTBOX_BATCH_SIZE = 500
+
+AGGREGATE_TYPES = {
+    Listing: 'listing',
+    Booking: 'booking',
+    Review: 'review',
+}
+
+# Fields copied into event payloads so consumers can route an event
+# without loading the row (it may already be deleted)
+PAYLOAD_FIELDS = {
+    Listing: ['host_id', 'status', 'is_available'],
+    Booking: ['listing_id', 'guest_id', 'booking_status'],
+    Review: ['listing_id', 'reviewer_id'],
+}
+
+
+def build_event(instance, event_type):
+    model = type(instance)
+    return OutboxEvent(
+        aggregate_type=AGGREGATE_TYPES[model],
+        aggregate_id=instance.pk,
+        event_type=event_type,
+        payload={field: getattr(instance, field) for field in PAYLOAD_FIELDS[model]},
+    )
+
+
+def record_event(instance, event_type):
+    """Append an event for one saved or deleted instance"""
+    build_event(instance, event_type).save()
+
+
+def record_events(model, ids, event_type='updated'):
+    """
+    Append events for rows changed in bulk (e.g. by queryset.update()).
+    Call inside the transaction that changed them.
+    """
+    ids = list(ids)
+    if not ids:
+        return
+    rows = model.objects.filter(pk__in=ids).order_by().values('pk', *PAYLOAD_FIELDS[model])
+    OutboxEvent.objects.bulk_create(
+        (
+            OutboxEvent(
+                aggregate_type=AGGREGATE_TYPES[model],
+                aggregate_id=row.pop('pk'),
+                event_type=event_type,
+                payload=row,
+            )
+            for row in rows
+        ),
+        batch_size=OUTBOX_BATCH_SIZE,
+    )
+
+
+def read_events(after=0, limit=OUTBOX_BATCH_SIZE, aggregate_types=None):
+    """
+    Settled events with id > after, oldest first. Returns (events, position):
+    pass position as the next `after`. It can move past the last returned
+    event when aggregate_types filters events out.
+    """
+    timeout = timedelta(seconds=getattr(settings, 'OUTBOX_GAP_TIMEOUT', 60))
+    settled_before = timezone.now() - timeout
+    events = []
+    position = after
+    # Gaps are only visible among all events, so filter by type here
+    for event in OutboxEvent.objects.filter(id__gt=after).order_by('id')[:limit]:
+        if event.id != position + 1 and event.created_at > settled_before:
+            # An earlier id may still be in flight; wait for it
+            break
+        position = event.id
+        if not aggregate_types or event.aggregate_type in aggregate_types:
+            events.append(event)
+    return events, position
+
+
+def get_checkpoint(consumer):
+    checkpoint, _ = OutboxCheckpoint.objects.get_or_create(consumer=consumer)
+    return checkpoint.position
+
+
+def save_checkpoint(consumer, position):
+    OutboxCheckpoint.objects.update_or_create(consumer=consumer, defaults={'position': position})
+
+
+def consume(consumer, handler, batch_size=OUTBOX_BATCH_SIZE, aggregate_types=None, max_batches=None):
+    """
+    Feed a consumer's pending events to handler(events) batch by batch,
+    advancing its checkpoint after each batch the handler accepts.
+    Returns the number of events handled.
+    """
+    position = get_checkpoint(consumer)
+    handled = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        events, next_position = read_events(position, batch_size, aggregate_types)
+        if next_position == position:
+            break
+        if events:
+            handler(events)
+        position = next_position
+        save_checkpoint(consumer, position)
+        handled += len(events)
+        batches += 1
+    return handled
+
+
+def compact(retention_days=None):
+    """
+    Delete events older than the retention window that every consumer
+    has processed. Returns the number of events deleted.
+    """
+    if retention_days is None:
+        retention_days = getattr(settings, 'OUTBOX_RETENTION_DAYS', 7)
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    with transaction.atomic():
+        processed = OutboxCheckpoint.objects.aggregate(position=Min('position'))['position']
+        if processed is None:
+            return 0
+        deleted, _ = OutboxEvent.objects.filter(id__lte=processed, created_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,96 @@
+"""
+Ownership checks for host and guest actions.
+
+Ownership is resolved from foreign key ids (`listing_id`, `guest_id`) and
+from relations already loaded with select_related, never by lazily walking
+`review.listing.host`. The set of listings a host owns is fetched with one
+values_list query and cached on the request, so batch actions and repeated
+checks in the same request do not re-query.
+"""
+from rest_framework import permissions
+
+from .models import Booking, Listing, Review
+
+OWNED_LISTINGS_ATTR = '_owned_listing_ids'
+
+
+def _http_request(request):
+    # Cache on the underlying HttpRequest so DRF and plain Django code share it
+    return getattr(request, '_request', request)
+
+
+def owned_listing_ids(request):
+    """Ids of the listings hosted by request.user, one query per request"""
+    http_request = _http_request(request)
+    owned = getattr(http_request, OWNED_LISTINGS_ATTR, None)
+    if owned is None:
+        user = request.user
+        if user.is_authenticated:
+            owned = frozenset(
+                Listing.objects.filter(host_id=user.pk).order_by().values_list('id', flat=True)
+            )
+        else:
+            owned = frozenset()
+        setattr(http_request, OWNED_LISTINGS_ATTR, owned)
+    return owned
+
+
+def is_listing_host(request, listing):
+    """
+    Whether request.user hosts the listing.
+    Accepts a Listing instance or a listing id.
+    """
+    if not request.user.is_authenticated:
+        return False
+    if isinstance(listing, Listing):
+        return listing.host_id == request.user.pk
+    return listing in owned_listing_ids(request)
+
+
+def _related_listing_host(request, obj):
+    # Use the listing already loaded by select_related('listing') if there is one
+    if type(obj).listing.is_cached(obj):
+        return is_listing_host(request, obj.listing)
+    return is_listing_host(request, obj.listing_id)
+
+
+def is_review_host(request, review):
+    """Whether request.user hosts the listing the review is about"""
+    return _related_listing_host(request, review)
+
+
+def is_booking_host(request, booking):
+    """Whether request.user hosts the booked listing"""
+    return _related_listing_host(request, booking)
+
+
+def is_booking_guest(request, booking):
+    return request.user.is_authenticated and booking.guest_id == request.user.pk
+
+
+class IsListingHost(permissions.BasePermission):
+    """Only the host may edit a listing; anyone may read it"""
+    message = 'Only the host can modify this listing'
+
+    def has_object_permission(self, request, view, obj):
+        if request.method in permissions.SAFE_METHODS:
+            return True
+        return is_listing_host(request, obj)
+
+
+class IsReviewListingHost(permissions.BasePermission):
+    """Only the host of the reviewed listing may respond to a review"""
+    message = 'Only the host can respond'
+
+    def has_object_permission(self, request, view, obj):
+        return isinstance(obj, Review) and is_review_host(request, obj)
+
+
+class IsBookingGuestOrHost(permissions.BasePermission):
+    """The guest who booked or the host of the listing may act on a booking"""
+    message = 'Only the guest or the host can modify this booking'
+
+    def has_object_permission(self, request, view, obj):
+        return isinstance(obj, Booking) and (
+            is_booking_guest(request, obj) or is_booking_host(request, obj)
+        )
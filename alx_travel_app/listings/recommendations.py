@@ -0,0 +1,191 @@
+"""
+Offline "similar listings" computation.
+
+Every active listing gets a feature vector (property type, price, capacity,
+location and amenities), L2-normalized so that a dot product is the cosine
+similarity. Top-k neighbors are found with blocked matrix products: a block
+of query rows is multiplied against blocks of candidate rows and a running
+top-k is kept, so memory stays bounded however many listings there are.
+Results are stored in SimilarListing and read back with one indexed query.
+
+NumPy is required here (it is optional elsewhere in the app).
+"""
+import math
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from .models import Listing, SimilarListing
+
+DEFAULT_NEIGHBORS = 10
+# Each step scores QUERY_BLOCK_SIZE x CANDIDATE_BLOCK_SIZE pairs; with the
+# merged id/score copies and argpartition that peaks around 50 MB
+QUERY_BLOCK_SIZE = 256
+CANDIDATE_BLOCK_SIZE = 8192
+TOP_AMENITIES = 32
+
+# Relative weight of each feature group in the similarity
+WEIGHTS = {
+    'property_type': 1.0,
+    'price': 1.0,
+    'capacity': 0.5,
+    'location': 2.0,
+    'amenities': 0.5,
+}
+FEATURE_FIELDS = [
+    'id', 'property_type', 'base_price', 'max_guests', 'bedrooms',
+    'latitude', 'longitude', 'amenities'
+]
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError('numpy is required to compute similar listings')
+    return numpy
+
+
+def _amenity_tokens(amenities):
+    return {token.strip().lower() for token in amenities.split(',') if token.strip()}
+
+
+def build_features(rows):
+    """
+    (ids, matrix) for listing rows of FEATURE_FIELDS.
+    matrix has one L2-normalized float32 row per listing.
+    """
+    np = _numpy()
+    rows = list(rows)
+    ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    if not rows:
+        return ids, np.zeros((0, 0), dtype=np.float32)
+
+    types = [code for code, _ in Listing.PROPERTY_TYPES]
+    amenity_counts = Counter(token for row in rows for token in _amenity_tokens(row[7]))
+    amenities = [token for token, _ in amenity_counts.most_common(TOP_AMENITIES)]
+
+    type_index = {code: i for i, code in enumerate(types)}
+    amenity_index = {token: i for i, token in enumerate(amenities)}
+    width = len(types) + 3 + 3 + len(amenities)
+    matrix = np.zeros((len(rows), width), dtype=np.float32)
+
+    price = np.array([math.log1p(float(row[2])) for row in rows], dtype=np.float32)
+    guests = np.array([row[3] for row in rows], dtype=np.float32)
+    bedrooms = np.array([row[4] for row in rows], dtype=np.float32)
+
+    def standardize(column):
+        spread = column.std()
+        return (column - column.mean()) / spread if spread else column * 0
+
+    offset = len(types)
+    matrix[:, offset] = standardize(price) * WEIGHTS['price']
+    matrix[:, offset + 1] = standardize(guests) * WEIGHTS['capacity']
+    matrix[:, offset + 2] = standardize(bedrooms) * WEIGHTS['capacity']
+    offset += 3
+
+    for i, row in enumerate(rows):
+        matrix[i, type_index.get(row[1], type_index['other'])] = WEIGHTS['property_type']
+        lat, lng = row[5], row[6]
+        if lat is not None and lng is not None:
+            # Point on the unit sphere, so nearby listings have close vectors
+            lat, lng = math.radians(float(lat)), math.radians(float(lng))
+            matrix[i, offset:offset + 3] = (
+                math.cos(lat) * math.cos(lng) * WEIGHTS['location'],
+                math.cos(lat) * math.sin(lng) * WEIGHTS['location'],
+                math.sin(lat) * WEIGHTS['location'],
+            )
+        tokens = [amenity_index[token] for token in _amenity_tokens(row[7]) if token in amenity_index]
+        if tokens:
+            matrix[i, [offset + 3 + token for token in tokens]] = WEIGHTS['amenities'] / math.sqrt(len(tokens))
+
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return ids, matrix / norms
+
+
+def top_k_neighbors(queries, query_ids, candidates, candidate_ids, k):
+    """
+    For each query row, the k most similar candidate rows (excluding itself).
+    Returns (neighbor ids, scores), each shaped (len(queries), k').
+    """
+    np = _numpy()
+    k = min(k, max(len(candidate_ids) - 1, 0))
+    best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+    best_ids = np.zeros((len(queries), k), dtype=np.int64)
+    if not k:
+        return best_ids, best_scores
+
+    for start in range(0, len(candidates), CANDIDATE_BLOCK_SIZE):
+        block_ids = candidate_ids[start:start + CANDIDATE_BLOCK_SIZE]
+        scores = queries @ candidates[start:start + CANDIDATE_BLOCK_SIZE].T
+        scores[query_ids[:, None] == block_ids[None, :]] = -np.inf
+
+        # Merge this block's scores with the running top-k
+        merged_scores = np.concatenate([best_scores, scores], axis=1)
+        merged_ids = np.concatenate([best_ids, np.broadcast_to(block_ids, scores.shape)], axis=1)
+        top = np.argpartition(-merged_scores, k - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(merged_scores, top, axis=1)
+        best_ids = np.take_along_axis(merged_ids, top, axis=1)
+
+    order = np.argsort(-best_scores, axis=1, kind='stable')
+    return np.take_along_axis(best_ids, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+
+def _store(source_ids, neighbor_ids, scores, computed_at):
+    np = _numpy()
+    rows = []
+    for source_id, neighbors, source_scores in zip(source_ids.tolist(), neighbor_ids, scores):
+        valid = np.isfinite(source_scores)
+        for rank, (similar_id, score) in enumerate(
+            zip(neighbors[valid].tolist(), source_scores[valid].tolist()), start=1
+        ):
+            rows.append(SimilarListing(
+                listing_id=source_id, similar_id=similar_id, rank=rank,
+                score=score, computed_at=computed_at,
+            ))
+    with transaction.atomic():
+        SimilarListing.objects.filter(listing_id__in=source_ids.tolist()).delete()
+        SimilarListing.objects.bulk_create(rows, batch_size=5000)
+
+
+def build_similar_listings(k=DEFAULT_NEIGHBORS, full=False):
+    """
+    Recompute neighbor lists; returns how many listings were refreshed.
+
+    Incremental runs (the default once the table has data) refresh only
+    listings changed since the last run, plus listings whose current
+    neighbors changed or were deactivated. New listings only show up in
+    unchanged listings' neighbors after a full run, so schedule one
+    periodically.
+    """
+    np = _numpy()
+    computed_at = timezone.now()
+    last_run = None if full else SimilarListing.objects.aggregate(last=Max('computed_at'))['last']
+
+    active = Listing.objects.filter(status='active').order_by('pk').values_list(*FEATURE_FIELDS)
+    ids, matrix = build_features(active.iterator(chunk_size=5000))
+
+    if last_run is None:
+        SimilarListing.objects.exclude(listing_id__in=ids.tolist()).delete()
+        targets = np.arange(len(ids))
+    else:
+        changed = set(
+            Listing.objects.filter(updated_at__gte=last_run).order_by().values_list('id', flat=True)
+        )
+        # Listings that show a changed (or since deactivated) listing as a neighbor
+        affected = set(
+            SimilarListing.objects.filter(Q(similar_id__in=changed) | Q(similar__status__in=['inactive', 'pending']))
+            .order_by()
+            .values_list('listing_id', flat=True)
+        )
+        SimilarListing.objects.filter(listing__status__in=['inactive', 'pending']).delete()
+        targets = np.flatnonzero(np.isin(ids, list(changed | affected)))
+
+    for start in range(0, len(targets), QUERY_BLOCK_SIZE):
+        block = targets[start:start + QUERY_BLOCK_SIZE]
+        neighbor_ids, scores = top_k_neighbors(matrix[block], ids[block], matrix, ids, k)
+        _store(ids[block], neighbor_ids, scores, computed_at)
+    return len(targets)
@@ -0,0 +1,76 @@
+"""
+Read-replica routing for catalog reads.
+
+Reads of the models in REPLICA_READ_MODELS (Listing and Review by default)
+go to one of the DATABASE_REPLICAS aliases; everything else, and every
+write, stays on `default`. After a write to one of REPLICA_STICKY_MODELS
+(bookings and reviews) the current context is pinned to the primary, and
+ReplicaPinningMiddleware keeps that client pinned for
+REPLICA_STICKY_SECONDS so users read their own writes despite replica lag.
+"""
+import contextvars
+import random
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# None: not pinned; 'cookie': pinned by a recent write in an earlier
+# request; 'write': pinned by a write in this request/context
+_pinned = contextvars.ContextVar('primary_pinned', default=None)
+
+
+def pin_to_primary(reason='write'):
+    return _pinned.set(reason)
+
+
+def unpin(token):
+    _pinned.reset(token)
+
+
+def pinned_by_write():
+    return _pinned.get() == 'write'
+
+
+def _replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def _labels(setting, default):
+    return {label.lower() for label in getattr(settings, setting, default)}
+
+
+class ReplicaRouter:
+    """Send catalog reads to replicas, with sticky-primary reads after writes"""
+
+    def __init__(self):
+        self.read_models = _labels('REPLICA_READ_MODELS', ['listings.Listing', 'listings.Review'])
+        self.sticky_models = _labels('REPLICA_STICKY_MODELS', ['listings.Booking', 'listings.Review'])
+
+    def db_for_read(self, model, **hints):
+        replicas = _replicas()
+        if (
+            not replicas
+            or model._meta.label_lower not in self.read_models
+            or _pinned.get() is not None
+            # Reads inside a transaction must see its uncommitted writes
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return None
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        if model._meta.label_lower in self.sticky_models and not pinned_by_write():
+            pin_to_primary('write')
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, *_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in _replicas():
+            return False
+        return None
@@ -1,6 +1,10 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Listing, Booking, Review
+from django.utils import timezone
+from .models import Listing, Booking, Review, SimilarListing, OutboxEvent
+from .cancellation import CancellationError, parse_policy
+from .counters import get_helpful_count, get_helpful_counts
+from .permissions import is_review_host
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -67,6 +71,25 @@ class ListingDetailSerializer(serializers.ModelSerializer):
         return []
 
 
+class SimilarListingSerializer(serializers.ModelSerializer):
+    """Serializer for precomputed similar listings"""
+    id = serializers.IntegerField(source='similar.id')
+    title = serializers.CharField(source='similar.title')
+    property_type = serializers.CharField(source='similar.property_type')
+    city = serializers.CharField(source='similar.city')
+    country = serializers.CharField(source='similar.country')
+    base_price = serializers.DecimalField(source='similar.base_price', max_digits=10, decimal_places=2)
+    max_guests = serializers.IntegerField(source='similar.max_guests')
+    main_image = serializers.URLField(source='similar.main_image')
+    
+    class Meta:
+        model = SimilarListing
+        fields = [
+            'id', 'title', 'property_type', 'city', 'country', 'base_price',
+            'max_guests', 'main_image', 'rank', 'score'
+        ]
+
+
 class ListingCreateUpdateSerializer(serializers.ModelSerializer):
     """Serializer for creating/updating listings"""
     
@@ -86,6 +109,16 @@ class ListingCreateUpdateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Base price must be greater than 0")
         return value
     
+    def validate_cancellation_policy(self, value):
+        try:
+            parse_policy(value)
+        except CancellationError as error:
+            raise serializers.ValidationError(
+                f"{error}. Use flexible, moderate, strict, non_refundable "
+                "or days:percent rules such as 14:100,7:50"
+            )
+        return value.strip().lower()
+    
     def validate(self, data):
         if data.get('max_guests', 0) < 1:
             raise serializers.ValidationError("Must accommodate at least 1 guest")
@@ -122,9 +155,24 @@ class BookingDetailSerializer(serializers.ModelSerializer):
             'total_guests', 'booking_status', 'total_price', 'nights',
             'payment_status', 'payment_method', 'special_requests',
             'confirmation_code', 'cancelled_at', 'cancellation_reason',
-            'created_at', 'updated_at'
+            'refund_amount', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'confirmation_code', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'confirmation_code', 'refund_amount', 'created_at', 'updated_at']
+
+
+class BookingHistorySerializer(serializers.Serializer):
+    """Serializer for guest booking history rows (hot and archived)"""
+    id = serializers.IntegerField()
+    listing_id = serializers.IntegerField()
+    confirmation_code = serializers.CharField()
+    check_in_date = serializers.DateField()
+    check_out_date = serializers.DateField()
+    nights = serializers.IntegerField()
+    total_price = serializers.DecimalField(max_digits=10, decimal_places=2)
+    booking_status = serializers.CharField()
+    payment_status = serializers.CharField()
+    created_at = serializers.DateTimeField()
+    archived = serializers.BooleanField()
 
 
 class BookingCreateSerializer(serializers.ModelSerializer):
@@ -197,14 +245,29 @@ class BookingCreateSerializer(serializers.ModelSerializer):
         return booking
 
 
+class ReviewListSerializer(serializers.ListSerializer):
+    """Fetches pending helpful votes for the whole page in one cache read"""
+
+    def to_representation(self, data):
+        reviews = list(data.all() if hasattr(data, 'all') else data)
+        self.child.helpful_counts = get_helpful_counts(reviews)
+        try:
+            return super().to_representation(reviews)
+        finally:
+            self.child.helpful_counts = None
+
+
 class ReviewSerializer(serializers.ModelSerializer):
     """Serializer for reviews"""
     reviewer = UserSerializer(read_only=True)
     listing = ListingListSerializer(read_only=True)
     average_rating = serializers.ReadOnlyField()
+    helpful_count = serializers.SerializerMethodField()
+    helpful_counts = None
     
     class Meta:
         model = Review
+        list_serializer_class = ReviewListSerializer
         fields = [
             'id', 'listing', 'booking', 'reviewer', 'overall_rating',
             'cleanliness_rating', 'accuracy_rating', 'communication_rating',
@@ -217,6 +280,11 @@ class ReviewSerializer(serializers.ModelSerializer):
             'id', 'reviewer', 'host_response', 'host_response_date',
             'helpful_count', 'is_verified', 'created_at', 'updated_at'
         ]
+    
+    def get_helpful_count(self, obj):
+        if self.helpful_counts is not None and obj.pk in self.helpful_counts:
+            return self.helpful_counts[obj.pk]
+        return get_helpful_count(obj)
 
 
 class ReviewCreateSerializer(serializers.ModelSerializer):
@@ -266,6 +334,20 @@ class HostResponseSerializer(serializers.Serializer):
     
     def validate(self, data):
         review = self.instance
-        if review.listing.host != self.context['request'].user:
+        if not is_review_host(self.context['request'], review):
             raise serializers.ValidationError("Only the host can respond")
-        return data
\ No newline at end of file
+        return data
+    
+    def update(self, instance, validated_data):
+        instance.host_response = validated_data['host_response']
+        instance.host_response_date = timezone.now()
+        instance.save(update_fields=['host_response', 'host_response_date', 'updated_at'])
+        return instance
+
+
+class OutboxEventSerializer(serializers.ModelSerializer):
+    """Serializer for outbox change feed events"""
+    
+    class Meta:
+        model = OutboxEvent
+        fields = ['id', 'aggregate_type', 'aggregate_id', 'event_type', 'payload', 'created_at']
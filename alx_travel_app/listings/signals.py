@@ -0,0 +1,100 @@
+"""
+Model signal handlers.
+
+- Keep the per-worker destination autocomplete index in step with Listing
+  writes once they commit, so a rolled-back write never skews its counts.
+  Nothing is done until the index has been built in this worker.
+- Drop deleted listings from this worker's search snapshot once the delete
+  commits.
+- Append outbox events for Listing, Booking and Review saves and deletes.
+  Saves run inside OutboxMixin's transaction and deletes inside the
+  deletion collector's, so each event commits with its row.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .autocomplete import FIELDS, destination_index
+from .models import Booking, Listing, Review
+from .outbox import record_event
+from .snapshot import listing_snapshot
+
+
+def _stored_destination(listing):
+    return {field: getattr(listing, field) for field in Listing.DESTINATION_FIELDS}
+
+
+def _active_destinations(stored):
+    """The {field: value} counted in the index for stored values, or None"""
+    if stored and stored['status'] == 'active':
+        return {field: stored[field] for field in FIELDS}
+    return None
+
+
+def _update_destination_index(previous, current):
+    """Swap previous for current destinations once the write commits"""
+    previous = _active_destinations(previous)
+    current = _active_destinations(current)
+    if previous == current:
+        return
+
+    def apply():
+        if not destination_index.is_built:
+            return
+        if previous:
+            destination_index.remove_listing(previous)
+        if current:
+            destination_index.add_listing(current)
+
+    transaction.on_commit(apply)
+
+
+@receiver(pre_save, sender=Listing)
+def remember_listing_destinations(sender, instance, raw=False, **kwargs):
+    # Listings loaded from the database carry their stored values (see
+    # Listing.from_db); only those built by hand with a pk are read back
+    if raw or not destination_index.is_built or instance.pk is None:
+        return
+    if not hasattr(instance, '_stored_destination'):
+        instance._stored_destination = (
+            Listing.objects.filter(pk=instance.pk).values(*Listing.DESTINATION_FIELDS).first()
+        )
+
+
+@receiver(post_save, sender=Listing)
+def update_destination_index(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    current = _stored_destination(instance)
+    if destination_index.is_built:
+        _update_destination_index(getattr(instance, '_stored_destination', None), current)
+    instance._stored_destination = current
+
+
+@receiver(post_delete, sender=Listing)
+def remove_from_destination_index(sender, instance, **kwargs):
+    if destination_index.is_built:
+        stored = getattr(instance, '_stored_destination', None) or _stored_destination(instance)
+        _update_destination_index(stored, None)
+
+
+@receiver(post_delete, sender=Listing)
+def remove_from_listing_snapshot(sender, instance, **kwargs):
+    listing_id = instance.pk
+    transaction.on_commit(lambda: listing_snapshot.discard(listing_id))
+
+
+@receiver(post_save, sender=Listing)
+@receiver(post_save, sender=Booking)
+@receiver(post_save, sender=Review)
+def record_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    record_event(instance, 'created' if created else 'updated')
+
+
+@receiver(post_delete, sender=Listing)
+@receiver(post_delete, sender=Booking)
+@receiver(post_delete, sender=Review)
+def record_deleted(sender, instance, **kwargs):
+    record_event(instance, 'deleted')
@@ -0,0 +1,341 @@
+"""
+Compact in-process snapshot of active listings for search ranking.
+
+Ranking only needs a handful of numeric columns, so instead of full Listing
+instances the snapshot keeps one typed `array.array` per column (8 bytes or
+less per value) with property_type and city interned to small integer
+codes. It is refreshed incrementally from `updated_at`, deleted listings
+are dropped by a post_delete hook in this worker, and the whole snapshot is
+rebuilt every LISTING_SNAPSHOT_REBUILD_SECONDS to drop listings deleted by
+other workers. Filtering and scoring run vectorized over NumPy views of the
+columns when NumPy is installed (imported on first search, not at startup),
+falling back to a plain loop otherwise.
+"""
+import math
+import threading
+import time
+from array import array
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db.models import Avg, Count
+from django.utils import timezone
+
+from .models import Listing, Review
+
+# numpy module once imported, False if it is not installed
+_np = None
+
+# Column name -> array typecode
+COLUMNS = {
+    'id': 'q',
+    'price': 'd',
+    'max_guests': 'I',
+    'bedrooms': 'I',
+    'property_type': 'B',
+    'city': 'I',
+    'latitude': 'd',
+    'longitude': 'd',
+    'rating': 'f',
+    'review_count': 'I',
+    'alive': 'B',
+}
+LISTING_FIELDS = [
+    'id', 'base_price', 'max_guests', 'bedrooms', 'property_type', 'city',
+    'latitude', 'longitude', 'status'
+]
+# Re-read rows changed slightly before the last refresh, to cover clock skew
+# between app servers; reloading a row is idempotent
+REFRESH_OVERLAP = timedelta(seconds=5)
+# Rebuild from scratch once this share of rows are dead (deactivated)
+COMPACT_RATIO = 0.25
+
+EARTH_RADIUS_KM = 6371.0
+# Review counts beyond this add no further score
+POPULAR_REVIEW_COUNT = 100
+
+
+def get_numpy():
+    """numpy, imported on first use, or None when it is not installed"""
+    global _np
+    if _np is None:
+        try:
+            import numpy
+        except ImportError:  # pragma: no cover - numpy is optional
+            numpy = False
+        _np = numpy
+    return _np or None
+
+
+class Interner:
+    """Maps strings to small integer codes"""
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def get(self, value):
+        return self.codes.get(value)
+
+
+class ListingSnapshot:
+    """Columnar snapshot of active listings"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.columns = {name: array(typecode) for name, typecode in COLUMNS.items()}
+        self.positions = {}
+        self.property_types = Interner()
+        self.cities = Interner()
+        self.dead = 0
+        self.watermark = None
+        self.refreshed_at = None
+        self.built_at = None
+
+    def __len__(self):
+        return len(self.positions)
+
+    def nbytes(self):
+        """Approximate memory held by the columns and lookup tables"""
+        columns = sum(column.itemsize * len(column) for column in self.columns.values())
+        # dict entry plus two boxed ints per position
+        positions = len(self.positions) * (3 * 8 + 2 * 28)
+        return columns + positions
+
+    def rebuild(self):
+        """Reload every active listing"""
+        with self._lock:
+            self._rebuild()
+
+    def _rebuild(self):
+        started = timezone.now()
+        self._reset()
+        self._load_listings(Listing.objects.filter(status='active'))
+        self._load_ratings()
+        self.watermark = started
+        self.refreshed_at = self.built_at = time.monotonic()
+
+    def refresh(self):
+        """Apply listings and reviews changed since the last load"""
+        max_age = getattr(settings, 'LISTING_SNAPSHOT_REBUILD_SECONDS', 600)
+        with self._lock:
+            if (
+                self.watermark is None
+                or self.dead > len(self.columns['id']) * COMPACT_RATIO
+                # Deletes leave no updated_at trace, so rebuild to drop them
+                or time.monotonic() - self.built_at >= max_age
+            ):
+                self._rebuild()
+                return
+
+            started = timezone.now()
+            since = self.watermark - REFRESH_OVERLAP
+            added = self._load_listings(Listing.objects.filter(updated_at__gte=since))
+            reviewed = set(
+                Review.objects.filter(updated_at__gte=since)
+                .order_by()
+                .values_list('listing_id', flat=True)
+            )
+            if added or reviewed:
+                self._load_ratings(added | reviewed)
+            self.watermark = started
+            self.refreshed_at = time.monotonic()
+
+    def _load_listings(self, queryset):
+        """Upsert or drop rows; returns ids of listings appended"""
+        columns = self.columns
+        added = set()
+        rows = queryset.order_by().values_list(*LISTING_FIELDS).iterator(chunk_size=5000)
+        for listing_id, price, guests, bedrooms, property_type, city, lat, lng, status in rows:
+            position = self.positions.get(listing_id)
+            if status != 'active':
+                self._drop(listing_id)
+                continue
+
+            values = (
+                ('price', float(price)),
+                ('max_guests', guests),
+                ('bedrooms', bedrooms),
+                ('property_type', self.property_types.code(property_type)),
+                ('city', self.cities.code(city)),
+                ('latitude', float(lat) if lat is not None else math.nan),
+                ('longitude', float(lng) if lng is not None else math.nan),
+            )
+            if position is None:
+                self.positions[listing_id] = len(columns['id'])
+                columns['id'].append(listing_id)
+                for name, value in values:
+                    columns[name].append(value)
+                columns['rating'].append(0.0)
+                columns['review_count'].append(0)
+                columns['alive'].append(1)
+                added.add(listing_id)
+            else:
+                for name, value in values:
+                    columns[name][position] = value
+        return added
+
+    def _drop(self, listing_id):
+        position = self.positions.pop(listing_id, None)
+        if position is not None:
+            self.columns['alive'][position] = 0
+            self.dead += 1
+
+    def discard(self, listing_id):
+        """Drop a deleted listing without waiting for a rebuild"""
+        with self._lock:
+            self._drop(listing_id)
+
+    def _load_ratings(self, listing_ids=None):
+        queryset = Review.objects.order_by().values('listing_id')
+        if listing_ids is not None:
+            queryset = queryset.filter(listing_id__in=listing_ids)
+        rows = queryset.annotate(avg=Avg('overall_rating'), count=Count('id')).values_list(
+            'listing_id', 'avg', 'count'
+        )
+        for listing_id, rating, count in rows.iterator(chunk_size=5000):
+            position = self.positions.get(listing_id)
+            if position is not None:
+                self.columns['rating'][position] = rating
+                self.columns['review_count'][position] = count
+
+    def search(self, city=None, property_type=None, guests=None, bedrooms=None,
+               min_price=None, max_price=None, near=None, radius_km=None, limit=20):
+        """
+        Rank matching listings; returns [(listing_id, score), ...] best first.
+        near is a (latitude, longitude) pair; listings closer to it score higher.
+        """
+        filters = {
+            'city': self.cities.get(city) if city else None,
+            'property_type': self.property_types.get(property_type) if property_type else None,
+        }
+        # A city or type never seen in the snapshot cannot match anything
+        if (city and filters['city'] is None) or (property_type and filters['property_type'] is None):
+            return []
+
+        if limit < 1:
+            return []
+        np = get_numpy()
+        with self._lock:
+            if not self.positions:
+                return []
+            search = partial(_search_numpy, np) if np is not None else _search_python
+            return search(
+                self.columns, filters['city'], filters['property_type'], guests, bedrooms,
+                min_price, max_price, near, radius_km, limit
+            )
+
+
+def _search_numpy(np, columns, city, property_type, guests, bedrooms,
+                  min_price, max_price, near, radius_km, limit):
+    col = {name: np.frombuffer(column, dtype=column.typecode) for name, column in columns.items()}
+    mask = col['alive'].astype(bool)
+    if city is not None:
+        mask &= col['city'] == city
+    if property_type is not None:
+        mask &= col['property_type'] == property_type
+    if guests:
+        mask &= col['max_guests'] >= guests
+    if bedrooms:
+        mask &= col['bedrooms'] >= bedrooms
+    if min_price is not None:
+        mask &= col['price'] >= min_price
+    if max_price is not None:
+        mask &= col['price'] <= max_price
+
+    rows = np.flatnonzero(mask)
+    if not len(rows):
+        return []
+
+    price = col['price'][rows]
+    score = (
+        0.6 * col['rating'][rows] / 5
+        + 0.2 * np.minimum(np.log1p(col['review_count'][rows]) / math.log1p(POPULAR_REVIEW_COUNT), 1)
+        + 0.2 * (1 - price / max(price.max(), 1))
+    )
+    if near is not None:
+        lat = np.radians(col['latitude'][rows])
+        lng = np.radians(col['longitude'][rows])
+        near_lat, near_lng = math.radians(near[0]), math.radians(near[1])
+        # Equirectangular approximation; accurate enough for ranking
+        x = (lng - near_lng) * np.cos((lat + near_lat) / 2)
+        distance = np.hypot(x, lat - near_lat) * EARTH_RADIUS_KM
+        # Listings without coordinates (NaN) are dropped when searching nearby
+        keep = ~np.isnan(distance)
+        if radius_km is not None:
+            keep &= distance <= radius_km
+        rows, score, distance = rows[keep], score[keep], distance[keep]
+        score = score - distance / 100
+
+    if len(rows) > limit:
+        top = np.argpartition(-score, limit)[:limit]
+        rows, score = rows[top], score[top]
+    order = np.argsort(-score, kind='stable')
+    ids = col['id'][rows[order]]
+    return list(zip(ids.tolist(), score[order].tolist()))
+
+
+def _search_python(columns, city, property_type, guests, bedrooms,
+                   min_price, max_price, near, radius_km, limit):
+    rows = []
+    for position in range(len(columns['id'])):
+        if not columns['alive'][position]:
+            continue
+        if city is not None and columns['city'][position] != city:
+            continue
+        if property_type is not None and columns['property_type'][position] != property_type:
+            continue
+        if guests and columns['max_guests'][position] < guests:
+            continue
+        if bedrooms and columns['bedrooms'][position] < bedrooms:
+            continue
+        price = columns['price'][position]
+        if (min_price is not None and price < min_price) or (max_price is not None and price > max_price):
+            continue
+        rows.append(position)
+    if not rows:
+        return []
+
+    top_price = max(max(columns['price'][position] for position in rows), 1)
+    scored = []
+    for position in rows:
+        score = (
+            0.6 * columns['rating'][position] / 5
+            + 0.2 * min(math.log1p(columns['review_count'][position]) / math.log1p(POPULAR_REVIEW_COUNT), 1)
+            + 0.2 * (1 - columns['price'][position] / top_price)
+        )
+        if near is not None:
+            lat = math.radians(columns['latitude'][position])
+            lng = math.radians(columns['longitude'][position])
+            near_lat, near_lng = math.radians(near[0]), math.radians(near[1])
+            x = (lng - near_lng) * math.cos((lat + near_lat) / 2)
+            distance = math.hypot(x, lat - near_lat) * EARTH_RADIUS_KM
+            if math.isnan(distance) or (radius_km is not None and distance > radius_km):
+                continue
+            score -= distance / 100
+        scored.append((columns['id'][position], score))
+    scored.sort(key=lambda item: item[1], reverse=True)
+    return scored[:limit]
+
+
+listing_snapshot = ListingSnapshot()
+
+
+def get_listing_snapshot():
+    """The shared snapshot, refreshed when older than LISTING_SNAPSHOT_REFRESH_SECONDS"""
+    max_age = getattr(settings, 'LISTING_SNAPSHOT_REFRESH_SECONDS', 30)
+    refreshed_at = listing_snapshot.refreshed_at
+    if refreshed_at is None or time.monotonic() - refreshed_at >= max_age:
+        listing_snapshot.refresh()
+    return listing_snapshot
@@ -1,3 +1,662 @@
-from django.test import TestCase
+import json
+import threading
+from datetime import date, timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .archive import archive_bookings
+from .autocomplete import destination_index
+from .cancellation import cancel_booking, cancel_future_bookings
+from .counters import HelpfulCountBuffer, reconcile_helpful_counts, record_helpful_vote
+from .exports import stream_export
+from .middleware import PIN_COOKIE, ReplicaPinningMiddleware
+from .models import ArchivedBooking, Booking, HelpfulVote, Listing, OutboxEvent, Review, SimilarListing
+from .outbox import get_checkpoint, read_events
+from .permissions import is_listing_host, is_review_host
+from .recommendations import build_similar_listings, top_k_neighbors
+from .routers import pin_to_primary, unpin
+from .snapshot import listing_snapshot
+from .throttling import ScopedTokenBucketThrottle, TokenBucketThrottle
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def create_listing(host, **fields):
+    values = {
+        'title': 'Cottage', 'description': 'A cottage', 'property_type': 'house',
+        'address': '1 Main St', 'city': 'Lisbon', 'country': 'Portugal',
+        'base_price': 100, 'max_guests': 2,
+    }
+    values.update(fields)
+    return Listing.objects.create(host=host, **values)
+
+
+def create_booking(listing, guest, code, **fields):
+    values = {
+        'check_in_date': date(2030, 1, 1), 'check_out_date': date(2030, 1, 3),
+        'total_price': 200, 'nights': 2,
+    }
+    values.update(fields)
+    return Booking.objects.create(listing=listing, guest=guest, confirmation_code=code, **values)
+
+
+def create_review(booking, **fields):
+    values = {
+        'overall_rating': 5, 'cleanliness_rating': 5, 'accuracy_rating': 5,
+        'communication_rating': 5, 'location_rating': 5, 'value_rating': 5,
+        'checkin_rating': 5, 'comment': 'Lovely',
+    }
+    values.update(fields)
+    return Review.objects.create(listing=booking.listing, booking=booking, reviewer=booking.guest, **values)
+
+
+class HelpfulVoteConcurrencyTests(TransactionTestCase):
+    """Many voters hitting one review at once"""
+    voters = 16
+    votes_per_voter = 3
+
+    def setUp(self):
+        cache.clear()
+        host = User.objects.create_user('host')
+        guest = User.objects.create_user('guest')
+        booking = create_booking(create_listing(host), guest, 'HELPFUL1')
+        self.review = create_review(booking)
+        self.users = [User.objects.create_user(f'voter{i}') for i in range(self.voters)]
+        # Flushes only when the test asks for one
+        self.buffer = HelpfulCountBuffer(flush_interval=3600, flush_threshold=10 ** 6)
+        patcher = mock.patch('listings.counters.helpful_counts', self.buffer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def vote_concurrently(self):
+        barrier = threading.Barrier(self.voters)
+        results = []
+        errors = []
+
+        def vote(user):
+            try:
+                barrier.wait()
+                # Every voter retries, so duplicates race on the unique constraint
+                for _ in range(self.votes_per_voter):
+                    results.append(record_helpful_vote(self.review, user))
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=vote, args=(user,)) for user in self.users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        return results
+
+    def test_duplicate_votes_are_rejected(self):
+        results = self.vote_concurrently()
+
+        self.assertEqual(results.count(True), self.voters)
+        self.assertEqual(results.count(False), self.voters * (self.votes_per_voter - 1))
+        self.assertEqual(HelpfulVote.objects.filter(review=self.review).count(), self.voters)
+
+    def test_flush_writes_every_vote(self):
+        self.vote_concurrently()
+        self.review.refresh_from_db()
+        self.assertEqual(self.review.helpful_count, 0)
+        self.assertEqual(self.buffer.pending(self.review.pk), self.voters)
+
+        self.buffer.flush()
+
+        self.review.refresh_from_db()
+        self.assertEqual(self.review.helpful_count, self.voters)
+        self.assertEqual(self.buffer.pending(self.review.pk), 0)
+        self.assertEqual(self.buffer.flush(), 0)
+
+    def test_timer_flushes_without_further_votes(self):
+        self.buffer.flush_interval = 0.2
+        self.assertTrue(record_helpful_vote(self.review, self.users[0]))
+
+        timer = self.buffer._timer
+        self.assertIsNotNone(timer)
+        timer.join(timeout=5)
+
+        self.review.refresh_from_db()
+        self.assertEqual(self.review.helpful_count, 1)
+        self.assertIsNone(self.buffer._timer)
+
+    def test_any_worker_drains_a_dead_workers_votes(self):
+        self.vote_concurrently()
+        # A fresh buffer stands in for another worker; the voters' buffer
+        # is never flushed, as if its process had been killed
+        other_worker = HelpfulCountBuffer(flush_interval=3600, flush_threshold=10 ** 6)
+
+        self.assertEqual(other_worker.flush(), 1)
+
+        self.review.refresh_from_db()
+        self.assertEqual(self.review.helpful_count, self.voters)
+        self.assertEqual(self.buffer.pending(self.review.pk), 0)
+
+    def test_reconcile_repairs_drift(self):
+        self.vote_concurrently()
+        self.buffer.flush()
+        # Simulate lost increments and a stale pending counter
+        Review.objects.filter(pk=self.review.pk).update(helpful_count=3)
+        cache.set(f'helpful_count:pending:{self.review.pk}', 0)
+
+        self.assertEqual(reconcile_helpful_counts(), [self.review.pk])
+
+        self.review.refresh_from_db()
+        self.assertEqual(self.review.helpful_count, self.voters)
+        self.assertEqual(reconcile_helpful_counts(), [])
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    Runs against the separate replica1 SQLite database settings.py defines
+    for tests. Nothing replicates into it, so replica reads only see rows
+    written there directly.
+    """
+    # Not TestCase: reads inside its per-test transaction always use the primary
+    databases = {'default', 'replica1'}
+
+    def setUp(self):
+        token = pin_to_primary(None)
+        self.addCleanup(unpin, token)
+        self.host = User.objects.create_user('host')
+        self.guest = User.objects.create_user('guest')
+        self.listing = create_listing(self.host)
+        self.booking = create_booking(self.listing, self.guest, 'REPLICA1', booking_status='completed')
+        # Writing the fixtures pinned this context to the primary
+        pin_to_primary(None)
+
+    def test_listing_and_review_reads_use_replica(self):
+        self.assertEqual(Listing.objects.all().db, 'replica1')
+        self.assertEqual(Review.objects.all().db, 'replica1')
+        with CaptureQueriesContext(connections['replica1']) as replica_queries:
+            list(Listing.objects.filter(city='Lisbon'))
+        self.assertEqual(len(replica_queries), 1)
+
+    def test_replica_read_does_not_see_primary_only_rows(self):
+        self.assertTrue(Listing.objects.using('default').filter(pk=self.listing.pk).exists())
+        with CaptureQueriesContext(connections['replica1']) as replica_queries:
+            self.assertFalse(Listing.objects.filter(pk=self.listing.pk).exists())
+        self.assertEqual(len(replica_queries), 1)
+
+    def test_booking_reads_use_primary(self):
+        self.assertEqual(Booking.objects.all().db, 'default')
+        with CaptureQueriesContext(connections['replica1']) as replica_queries:
+            list(Booking.objects.filter(guest=self.guest))
+        self.assertEqual(len(replica_queries), 0)
+
+    def test_writes_use_primary(self):
+        listing = create_listing(self.host, title='Loft')
+        review = create_review(self.booking)
+        self.assertEqual(listing._state.db, 'default')
+        self.assertEqual(review._state.db, 'default')
+
+    def test_sticky_write_pins_reads_to_primary(self):
+        self.assertEqual(Listing.objects.all().db, 'replica1')
+        create_booking(self.listing, self.guest, 'REPLICA2')
+        self.assertEqual(Listing.objects.all().db, 'default')
+
+    def test_reads_in_atomic_block_use_primary(self):
+        with transaction.atomic():
+            self.assertEqual(Listing.objects.all().db, 'default')
+            self.assertEqual(Review.objects.all().db, 'default')
+        self.assertEqual(Listing.objects.all().db, 'replica1')
+
+    def test_middleware_sets_cookie_after_booking_write(self):
+        def write_booking(request):
+            create_booking(self.listing, self.guest, 'REPLICA3')
+            return HttpResponse()
+
+        response = ReplicaPinningMiddleware(write_booking)(RequestFactory().post('/'))
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+    def test_middleware_sets_cookie_after_review_write(self):
+        def write_review(request):
+            create_review(self.booking)
+            return HttpResponse()
+
+        response = ReplicaPinningMiddleware(write_review)(RequestFactory().post('/'))
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+    def test_middleware_leaves_reads_unpinned(self):
+        def read_listings(request):
+            self.assertEqual(Listing.objects.all().db, 'replica1')
+            return HttpResponse()
+
+        response = ReplicaPinningMiddleware(read_listings)(RequestFactory().get('/'))
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_middleware_pins_client_with_cookie(self):
+        def read_listings(request):
+            self.assertEqual(Listing.objects.all().db, 'default')
+            return HttpResponse()
+
+        request = RequestFactory().get('/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        ReplicaPinningMiddleware(read_listings)(request)
+        # The pin ends with the request
+        self.assertEqual(Listing.objects.all().db, 'replica1')
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class HostPermissionTests(TestCase):
+
+    def setUp(self):
+        self.host = User.objects.create_user('host')
+        self.guest = User.objects.create_user('guest')
+        self.listings = [create_listing(self.host, title=f'Flat {i}') for i in range(3)]
+        self.review = create_review(create_booking(self.listings[0], self.guest, 'PERM1'))
+
+    def test_ownership_is_queried_once_per_request(self):
+        request = RequestFactory().get('/')
+        request.user = self.host
+        other = create_listing(self.guest)
+
+        with self.assertNumQueries(1):
+            self.assertTrue(all(is_listing_host(request, listing.pk) for listing in self.listings))
+            self.assertFalse(is_listing_host(request, other.pk))
+            self.assertTrue(is_review_host(request, self.review))
+
+    def test_host_response_checks_ownership_once(self):
+        self.client.force_login(self.host)
+
+        # Session, user, review and owned listings (shared by the permission
+        # and serializer checks), then UPDATE and outbox INSERT in a savepoint
+        with self.assertNumQueries(8):
+            response = self.client.post(f'/api/reviews/{self.review.pk}/response/', {'host_response': 'Thanks'})
+
+        self.assertEqual(response.status_code, 200)
+        self.review.refresh_from_db()
+        self.assertEqual(self.review.host_response, 'Thanks')
+
+    def test_host_response_rejects_other_users(self):
+        self.client.force_login(self.guest)
+
+        response = self.client.post(f'/api/reviews/{self.review.pk}/response/', {'host_response': 'Thanks'})
+
+        self.assertEqual(response.status_code, 403)
+        self.review.refresh_from_db()
+        self.assertEqual(self.review.host_response, '')
+
+
+class CancellationTests(TestCase):
+
+    def setUp(self):
+        self.host = User.objects.create_user('host')
+        self.guest = User.objects.create_user('guest')
+
+    def test_unparseable_stored_policy_falls_back(self):
+        listing = create_listing(self.host, cancellation_policy='Free cancellation 24h before')
+        booking = create_booking(listing, self.guest, 'CANCEL1', payment_status='paid')
+
+        with self.assertLogs('listings.cancellation', 'WARNING'):
+            booking = cancel_booking(booking)
+
+        self.assertEqual(booking.booking_status, 'cancelled')
+        # Flexible: full refund more than a day before check-in
+        self.assertEqual(booking.refund_amount, booking.total_price)
+
+    @override_settings(ALLOWED_HOSTS=['testserver'])
+    def test_refund_preview_matches_cancellation(self):
+        listing = create_listing(self.host, cancellation_policy='moderate')
+        booking = create_booking(listing, self.guest, 'CANCEL3', payment_status='paid')
+        self.client.force_login(self.guest)
+
+        preview = self.client.get(f'/api/bookings/{booking.pk}/cancel/').json()
+        cancelled = self.client.post(f'/api/bookings/{booking.pk}/cancel/').json()
+
+        self.assertEqual(preview['refund_amount'], cancelled['refund_amount'])
+        self.assertEqual(self.client.get(f'/api/bookings/{booking.pk}/cancel/').status_code, 400)
+
+    def test_delist_takes_listing_off_the_site(self):
+        listing = create_listing(self.host)
+        create_booking(listing, self.guest, 'CANCEL2')
+
+        cancelled = cancel_future_bookings(listing, delist=True)
+
+        self.assertEqual(len(cancelled), 1)
+        listing.refresh_from_db()
+        self.assertEqual((listing.status, listing.is_available), ('inactive', False))
+
+
+class ArchiveTests(TestCase):
+
+    def test_review_is_the_only_relation_to_booking(self):
+        # archive_chunk() deletes bookings with _raw_delete, which neither
+        # cascades nor nulls references; a new relation must be handled there
+        relations = [
+            (relation.related_model._meta.label, relation.field.name)
+            for relation in Booking._meta.related_objects
+        ]
+        self.assertEqual(relations, [('listings.Review', 'booking')])
+
+
+class OutboxTests(TestCase):
+
+    def setUp(self):
+        self.host = User.objects.create_user('host')
+        self.guest = User.objects.create_user('guest')
+        self.listing = create_listing(self.host)
+
+    def events(self, aggregate_type, aggregate_id):
+        return list(
+            OutboxEvent.objects.filter(aggregate_type=aggregate_type, aggregate_id=aggregate_id)
+            .values_list('event_type', flat=True)
+        )
+
+    def test_archiving_emits_archived_not_deleted(self):
+        booking = create_booking(
+            self.listing, self.guest, 'OUTBOX1', booking_status='completed',
+            check_in_date=date(2000, 1, 1), check_out_date=date(2000, 1, 3),
+        )
+        review = create_review(booking)
+
+        self.assertEqual(archive_bookings(older_than_days=30), 1)
+
+        self.assertTrue(ArchivedBooking.objects.filter(pk=booking.pk).exists())
+        self.assertEqual(self.events('booking', booking.pk), ['created', 'archived'])
+        self.assertEqual(self.events('review', review.pk), ['created', 'updated'])
+
+    def test_read_stops_at_gap_until_timeout(self):
+        first = OutboxEvent.objects.get(aggregate_type='listing', aggregate_id=self.listing.pk)
+        for i in range(3):
+            create_listing(self.host, title=f'Flat {i}')
+        ids = list(OutboxEvent.objects.filter(id__gte=first.id).values_list('id', flat=True))
+        # An event whose transaction has not committed yet
+        OutboxEvent.objects.filter(pk=ids[1]).delete()
+
+        events, position = read_events(first.id - 1)
+        self.assertEqual([event.id for event in events], [first.id])
+        self.assertEqual(position, first.id)
+
+        OutboxEvent.objects.filter(pk=ids[2]).update(created_at=timezone.now() - timedelta(minutes=5))
+        events, position = read_events(first.id - 1)
+        self.assertEqual([event.id for event in events], [ids[0], ids[2], ids[3]])
+        self.assertEqual(position, ids[3])
+
+    def test_type_filter_advances_position(self):
+        first = OutboxEvent.objects.get(aggregate_type='listing', aggregate_id=self.listing.pk)
+        booking = create_booking(self.listing, self.guest, 'OUTBOX2')
+
+        events, position = read_events(first.id - 1, aggregate_types=['booking'])
+
+        self.assertEqual([event.aggregate_id for event in events], [booking.pk])
+        self.assertEqual(position, OutboxEvent.objects.latest('id').id)
+
+    @override_settings(ALLOWED_HOSTS=['testserver'], OUTBOX_GAP_TIMEOUT=0)
+    def test_events_view_checkpoints_consumer(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(admin)
+        self.assertEqual(self.client.get('/api/events/').status_code, 400)
+
+        response = self.client.get('/api/events/', {'consumer': 'search', 'limit': -1})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['events']), 1)
+        cursor = response.json()['next']
+        self.assertEqual(get_checkpoint('search'), 0)
+
+        # Passing the cursor back acknowledges it, so compaction keeps the rest
+        response = self.client.get('/api/events/', {'consumer': 'search', 'after': cursor})
+        self.assertEqual(response.json()['events'], [])
+        self.assertEqual(get_checkpoint('search'), cursor)
+        response = self.client.get('/api/events/', {'consumer': 'search'})
+        self.assertEqual(response.json()['next'], cursor)
+
+
+class ListingSnapshotTests(TestCase):
+
+    def setUp(self):
+        host = User.objects.create_user('host')
+        self.listings = [create_listing(host, city='Porto', title=f'Flat {i}') for i in range(3)]
+        listing_snapshot.rebuild()
+
+    def test_deleted_listing_is_dropped(self):
+        deleted = self.listings[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            deleted.delete()
+
+        ranked = [listing_id for listing_id, _ in listing_snapshot.search(city='Porto')]
+        self.assertEqual(sorted(ranked), sorted(listing.pk for listing in self.listings[1:]))
+
+    @override_settings(ALLOWED_HOSTS=['testserver'])
+    def test_search_clamps_limit(self):
+        response = self.client.get('/api/listings/search/', {'city': 'Porto', 'limit': -3})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 1)
+
+
+class DestinationIndexTests(TestCase):
+
+    def setUp(self):
+        self.host = User.objects.create_user('host')
+        create_listing(self.host, city='Lisbon', country='Portugal', neighborhood='Alfama')
+        create_listing(self.host, city='Lisbon', country='Portugal', neighborhood='Baixa')
+        create_listing(self.host, city='Lille', country='France')
+        create_listing(self.host, city='São Paulo', country='Brazil')
+        create_listing(self.host, city='Lima', country='Peru', status='inactive')
+        destination_index.rebuild()
+        self.addCleanup(setattr, destination_index, 'built_at', None)
+
+    def suggest(self, prefix, **kwargs):
+        return [(s['value'], s['kind'], s['listings']) for s in destination_index.suggest(prefix, **kwargs)]
+
+    def test_prefix_match_weighted_by_listing_count(self):
+        self.assertEqual(self.suggest('li'), [('Lisbon', 'city', 2), ('Lille', 'city', 1)])
+
+    def test_matching_ignores_case_and_accents(self):
+        self.assertEqual(self.suggest('SAO'), [('São Paulo', 'city', 1)])
+        self.assertEqual(self.suggest('são p'), [('São Paulo', 'city', 1)])
+
+    def test_kind_filter(self):
+        self.assertEqual(self.suggest('p', fields=['country']), [('Portugal', 'country', 2)])
+        self.assertEqual(self.suggest('a', fields=['neighborhood']), [('Alfama', 'neighborhood', 1)])
+
+    def test_save_and_delete_update_index_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            listing = create_listing(self.host, city='Madrid', country='Spain')
+        self.assertEqual(self.suggest('mad'), [('Madrid', 'city', 1)])
+
+        listing = Listing.objects.get(pk=listing.pk)
+        listing.city = 'Malaga'
+        with CaptureQueriesContext(connections['default']) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                listing.save()
+        self.assertEqual(self.suggest('ma'), [('Malaga', 'city', 1)])
+        # The stored values come from the load, not an extra SELECT
+        self.assertFalse([q for q in queries.captured_queries if q['sql'].startswith('SELECT')])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Listing.objects.get(city='Lima').delete()
+            listing.status = 'inactive'
+            listing.save()
+        self.assertEqual(self.suggest('ma'), [])
+        self.assertEqual(self.suggest('li'), [('Lisbon', 'city', 2), ('Lille', 'city', 1)])
+
+    def test_rolled_back_write_leaves_index_unchanged(self):
+        listing = Listing.objects.get(city='Lille')
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                listing.city = 'Lyon'
+                listing.save()
+                Listing.objects.get(city='São Paulo').delete()
+                raise RuntimeError
+
+        self.assertEqual(self.suggest('l'), [('Lisbon', 'city', 2), ('Lille', 'city', 1)])
+        self.assertEqual(self.suggest('sao'), [('São Paulo', 'city', 1)])
+
+
+@skipUnless(np, 'numpy is required for similar listings')
+class SimilarListingTests(TestCase):
+
+    def brute_force(self, vectors, ids, k):
+        scores = vectors @ vectors.T
+        np.fill_diagonal(scores, -np.inf)
+        order = np.argsort(-scores, axis=1, kind='stable')[:, :k]
+        return ids[order], np.take_along_axis(scores, order, axis=1)
+
+    def vectors(self, n):
+        vectors = np.random.default_rng(7).normal(size=(n, 5)).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def test_top_k_excludes_self(self):
+        vectors = self.vectors(6)
+        ids = np.arange(100, 106)
+
+        neighbor_ids, scores = top_k_neighbors(vectors, ids, vectors, ids, 3)
+
+        self.assertEqual(neighbor_ids.shape, (6, 3))
+        for source_id, neighbors in zip(ids, neighbor_ids):
+            self.assertNotIn(source_id, neighbors)
+        expected_ids, expected_scores = self.brute_force(vectors, ids, 3)
+        np.testing.assert_array_equal(neighbor_ids, expected_ids)
+        np.testing.assert_allclose(scores, expected_scores, rtol=1e-6)
+
+    def test_k_is_capped_at_other_listings(self):
+        vectors = self.vectors(4)
+        ids = np.arange(4)
+
+        neighbor_ids, scores = top_k_neighbors(vectors, ids, vectors, ids, 10)
+
+        self.assertEqual(neighbor_ids.shape, (4, 3))
+        self.assertTrue(np.isfinite(scores).all())
+        for source_id, neighbors in enumerate(neighbor_ids):
+            self.assertEqual(sorted(neighbors), [i for i in range(4) if i != source_id])
+
+    def test_top_k_merges_candidate_blocks(self):
+        vectors = self.vectors(23)
+        ids = np.arange(23) * 2
+
+        with mock.patch('listings.recommendations.CANDIDATE_BLOCK_SIZE', 4):
+            neighbor_ids, scores = top_k_neighbors(vectors[:7], ids[:7], vectors, ids, 5)
+
+        expected_ids, expected_scores = self.brute_force(vectors, ids, 5)
+        np.testing.assert_array_equal(neighbor_ids, expected_ids[:7])
+        np.testing.assert_allclose(scores, expected_scores[:7], rtol=1e-6)
+
+    def test_incremental_build_refreshes_changed_listing_and_its_referrers(self):
+        host = User.objects.create_user('host')
+        # Two far-apart clusters of three; with k=2 each listing's
+        # neighbors are the rest of its cluster
+        lisbon = [
+            create_listing(host, title=f'Lisbon {i}', latitude=38.7 + i / 100, longitude=-9.1)
+            for i in range(3)
+        ]
+        tokyo = [
+            create_listing(host, title=f'Tokyo {i}', latitude=35.6 + i / 100, longitude=139.7)
+            for i in range(3)
+        ]
+        self.assertEqual(build_similar_listings(k=2), 6)
+        first_run = SimilarListing.objects.latest('computed_at').computed_at
+        self.assertEqual(
+            set(SimilarListing.objects.filter(listing=lisbon[0]).values_list('similar_id', flat=True)),
+            {lisbon[1].pk, lisbon[2].pk},
+        )
+
+        lisbon[0].base_price = 400
+        lisbon[0].save()
+
+        self.assertEqual(build_similar_listings(k=2), 3)
+        refreshed = set(
+            SimilarListing.objects.filter(computed_at__gt=first_run).values_list('listing_id', flat=True)
+        )
+        self.assertEqual(refreshed, {listing.pk for listing in lisbon})
+        self.assertFalse(SimilarListing.objects.filter(listing__in=tokyo, computed_at__gt=first_run).exists())
+
+
+class ExportTests(TestCase):
+
+    def setUp(self):
+        host = User.objects.create_user('host')
+        guest = User.objects.create_user('guest')
+        listing = create_listing(host)
+        self.hot = create_booking(listing, guest, 'EXPORT1', booking_status='completed')
+        self.old = create_booking(
+            listing, guest, 'EXPORT2', booking_status='completed',
+            check_in_date=date(2000, 1, 1), check_out_date=date(2000, 1, 3),
+        )
+        self.review = create_review(self.old)
+        archive_bookings(older_than_days=30)
+
+    def export(self, name, **filters):
+        return [json.loads(line) for line in ''.join(stream_export(name, 'ndjson', **filters)).splitlines()]
+
+    def test_bookings_export_includes_archived(self):
+        rows = self.export('bookings')
+        self.assertEqual(
+            [(row['id'], row['archived']) for row in rows],
+            [(self.hot.pk, False), (self.old.pk, True)]
+        )
+
+    def test_reviews_export_follows_archived_booking(self):
+        [row] = self.export('reviews', status='completed')
+        self.assertEqual((row['booking_id'], row['archived_booking_id']), (None, self.old.pk))
+
+
+class ThreePerMinuteThrottle(TokenBucketThrottle):
+    rate = '3/min'
+
+    def get_cache_key(self, request, view):
+        return 'throttle_test'
+
+
+class TokenBucketThrottleTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.now = 1000.0
+        self.throttle = ThreePerMinuteThrottle()
+        self.throttle.timer = lambda: self.now
+
+    def allowed(self):
+        return self.throttle.allow_request(None, None)
+
+    def test_burst_refill_and_rejection(self):
+        # A full bucket allows a burst of num_requests
+        self.assertEqual([self.allowed() for _ in range(3)], [True, True, True])
+        self.assertFalse(self.allowed())
+        # One token refills every 20 seconds
+        self.assertAlmostEqual(self.throttle.wait(), 20)
+
+        self.now += 19
+        self.assertFalse(self.allowed())
+        self.assertAlmostEqual(self.throttle.wait(), 1)
+
+        self.now += 1
+        self.assertTrue(self.allowed())
+        self.assertFalse(self.allowed())
+
+        # Idle for a full period: the whole burst is available again
+        self.now += 60
+        self.assertEqual([self.allowed() for _ in range(4)], [True, True, True, False])
+
+    def test_rejected_requests_do_not_consume_tokens(self):
+        for _ in range(10):
+            self.allowed()
+        self.now += 20
+        self.assertTrue(self.allowed())
+
+    def test_anonymous_ident_ignores_forwarded_for(self):
+        throttle = ScopedTokenBucketThrottle()
+        throttle.scope = 'search_anon'
+        keys = set()
+        for forwarded in ('203.0.113.1', '203.0.113.2'):
+            request = RequestFactory().get('/', HTTP_X_FORWARDED_FOR=forwarded, REMOTE_ADDR='198.51.100.7')
+            request.user = AnonymousUser()
+            keys.add(throttle.get_cache_key(request, None))
+        self.assertEqual(keys, {'throttle_tb_search_anon_ip198.51.100.7'})
@@ -0,0 +1,96 @@
+"""
+Token-bucket request throttling stored in Django's cache.
+
+DRF's SimpleRateThrottle keeps a list of request timestamps per client and
+rewrites it on every request, so its cost grows with the rate. These
+throttles implement the token bucket as GCRA (generic cell rate algorithm):
+each client has a single integer, its "theoretical arrival time", advanced
+with an atomic cache.incr() per request. Cost is O(1) in time and space.
+
+The limits only hold across workers when the default cache is shared
+(CACHE_URL pointing at Redis or Memcached). With the local-memory fallback
+each process keeps its own buckets, multiplying the effective rate by the
+worker count; `manage.py check --deploy` warns about that.
+"""
+from rest_framework.throttling import SimpleRateThrottle
+
+MICROSECONDS = 1_000_000
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """
+    Token bucket of `num_requests` tokens refilled evenly over `duration`.
+    Subclasses provide `get_cache_key()` like any SimpleRateThrottle.
+    """
+    cache_format = 'throttle_tb_%(scope)s_%(ident)s'
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        now = int(self.timer() * MICROSECONDS)
+        interval = max(self.duration * MICROSECONDS // self.num_requests, 1)
+        capacity = interval * self.num_requests
+        # Keep the key until a full bucket would have refilled
+        timeout = self.duration + 1
+
+        try:
+            arrival = self.cache.incr(self.key, interval)
+        except ValueError:
+            if self.cache.add(self.key, now + interval, timeout):
+                arrival = now + interval
+            else:
+                arrival = self.cache.incr(self.key, interval)
+
+        if arrival - interval < now:
+            # The bucket refilled completely while idle; restart it from now.
+            # Two requests racing here can each get a token, which is harmless.
+            arrival = now + interval
+            self.cache.set(self.key, arrival, timeout)
+        else:
+            self.cache.touch(self.key, timeout)
+
+        if arrival - now > capacity:
+            # Out of tokens: give back the one we took
+            self.cache.decr(self.key, interval)
+            self.wait_seconds = (arrival - now - capacity) / MICROSECONDS
+            return False
+        return True
+
+    def wait(self):
+        return getattr(self, 'wait_seconds', None)
+
+
+class ScopedTokenBucketThrottle(TokenBucketThrottle):
+    """
+    Per-endpoint token bucket keyed by user id, or by client IP for
+    anonymous requests. Views opt in with `throttle_scope`; anonymous
+    clients use the `<scope>_anon` rate when one is configured.
+    """
+    scope_attr = 'throttle_scope'
+
+    def __init__(self):
+        # Rate is resolved per view in allow_request()
+        pass
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, self.scope_attr, None)
+        if not self.scope:
+            return True
+
+        if not request.user.is_authenticated and f'{self.scope}_anon' in self.THROTTLE_RATES:
+            self.scope = f'{self.scope}_anon'
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return super().allow_request(request, view)
+
+    def get_cache_key(self, request, view):
+        if request.user.is_authenticated:
+            ident = f'user{request.user.pk}'
+        else:
+            ident = f'ip{self.get_ident(request)}'
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
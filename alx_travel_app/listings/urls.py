@@ -1 +1,17 @@
-from django.urls import path
\ No newline at end of file
+from django.urls import path
+
+from . import views
+
+urlpatterns = [
+    path('listings/search/', views.ListingSearchView.as_view(), name='listing-search'),
+    path('autocomplete/destinations/', views.DestinationAutocompleteView.as_view(), name='destination-autocomplete'),
+    path('listings/<int:pk>/similar/', views.SimilarListingsView.as_view(), name='listing-similar'),
+    path('listings/<int:pk>/cancel-bookings/', views.ListingCancelBookingsView.as_view(), name='listing-cancel-bookings'),
+    path('bookings/history/', views.GuestBookingHistoryView.as_view(), name='booking-history'),
+    path('bookings/<int:pk>/cancel/', views.BookingCancelView.as_view(), name='booking-cancel'),
+    path('events/', views.OutboxEventsView.as_view(), name='outbox-events'),
+    path('exports/bookings/', views.BookingExportView.as_view(), name='export-bookings'),
+    path('exports/reviews/', views.ReviewExportView.as_view(), name='export-reviews'),
+    path('reviews/<int:pk>/helpful/', views.ReviewHelpfulVoteView.as_view(), name='review-helpful'),
+    path('reviews/<int:pk>/response/', views.ReviewHostResponseView.as_view(), name='review-host-response'),
+]
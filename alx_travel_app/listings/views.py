@@ -1,3 +1,290 @@
-from django.shortcuts import render
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.dateparse import parse_date
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-# Create your views here.
+from .archive import guest_booking_history
+from .autocomplete import FIELDS as DESTINATION_FIELDS, get_destination_index
+from .cancellation import (
+    CANCELLABLE_STATUSES, CancellationError, cancel_booking, cancel_future_bookings, compute_refund
+)
+from .counters import get_helpful_count, record_helpful_vote
+from .exports import CONTENT_TYPES, stream_export
+from .outbox import OUTBOX_BATCH_SIZE, get_checkpoint, read_events, save_checkpoint
+from .models import Booking, Listing, OutboxCheckpoint, Review, SimilarListing
+from .permissions import IsBookingGuestOrHost, IsListingHost, IsReviewListingHost, is_booking_host
+from .serializers import (
+    BookingDetailSerializer, BookingHistorySerializer, HostResponseSerializer, ListingListSerializer,
+    OutboxEventSerializer, SimilarListingSerializer
+)
+from .snapshot import get_listing_snapshot
+
+
+class ListingSearchView(APIView):
+    """
+    Ranked search over active listings, served from the in-memory snapshot.
+    Query params: city, property_type, guests, bedrooms, min_price,
+    max_price, near (lat,lng), radius_km, limit.
+    """
+    permission_classes = [permissions.AllowAny]
+    throttle_scope = 'search'
+    max_limit = 100
+
+    def get(self, request):
+        params = request.query_params
+        try:
+            near = params.get('near')
+            if near:
+                lat, lng = (float(value) for value in near.split(','))
+                near = (lat, lng)
+            options = {
+                'guests': int(params['guests']) if params.get('guests') else None,
+                'bedrooms': int(params['bedrooms']) if params.get('bedrooms') else None,
+                'min_price': float(params['min_price']) if params.get('min_price') else None,
+                'max_price': float(params['max_price']) if params.get('max_price') else None,
+                'radius_km': float(params['radius_km']) if params.get('radius_km') else None,
+                'limit': max(1, min(int(params.get('limit', 20)), self.max_limit)),
+            }
+        except ValueError:
+            return Response({'detail': 'Invalid search parameters'}, status=status.HTTP_400_BAD_REQUEST)
+
+        ranked = get_listing_snapshot().search(
+            city=params.get('city'), property_type=params.get('property_type'), near=near or None, **options
+        )
+        listings = (
+            Listing.objects.filter(status='active')
+            .select_related('host')
+            .prefetch_related('reviews')
+            .in_bulk([listing_id for listing_id, _ in ranked])
+        )
+        # The snapshot may briefly list a listing that was just deleted or delisted
+        page = [listings[listing_id] for listing_id, _ in ranked if listing_id in listings]
+        return Response(ListingListSerializer(page, many=True).data)
+
+
+class SimilarListingsView(APIView):
+    """Precomputed similar stays for a listing (one indexed query)"""
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, pk):
+        neighbors = (
+            SimilarListing.objects.filter(listing_id=pk, similar__status='active')
+            .select_related('similar')
+            .order_by('rank')
+        )
+        return Response(SimilarListingSerializer(neighbors, many=True).data)
+
+
+class DestinationAutocompleteView(APIView):
+    """
+    Destination suggestions for ?q=<prefix>, served from memory.
+    Optional: kind=city|country|neighborhood, limit.
+    """
+    permission_classes = [permissions.AllowAny]
+    # Called per keystroke, so it shares the search budget
+    throttle_scope = 'search'
+    max_limit = 20
+
+    def get(self, request):
+        kind = request.query_params.get('kind')
+        if kind and kind not in DESTINATION_FIELDS:
+            return Response(
+                {'detail': f"Unknown kind. Choose one of: {', '.join(DESTINATION_FIELDS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limit = min(int(request.query_params.get('limit', 8)), self.max_limit)
+        except ValueError:
+            return Response({'detail': 'Invalid limit'}, status=status.HTTP_400_BAD_REQUEST)
+
+        suggestions = get_destination_index().suggest(
+            request.query_params.get('q', ''), limit=limit, fields=[kind] if kind else None
+        )
+        return Response(suggestions)
+
+
+class ReviewHelpfulVoteView(APIView):
+    """Mark a review as helpful (one vote per user per review)"""
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'reviews'
+
+    def post(self, request, pk):
+        review = get_object_or_404(Review, pk=pk)
+        created = record_helpful_vote(review, request.user)
+        return Response(
+            {'review': review.pk, 'helpful_count': get_helpful_count(review)},
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+
+
+class ReviewHostResponseView(APIView):
+    """Host response to a review of one of their listings"""
+    permission_classes = [permissions.IsAuthenticated, IsReviewListingHost]
+    throttle_scope = 'reviews'
+
+    def post(self, request, pk):
+        review = get_object_or_404(Review, pk=pk)
+        self.check_object_permissions(request, review)
+        serializer = HostResponseSerializer(review, data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response({
+            'review': review.pk,
+            'host_response': review.host_response,
+            'host_response_date': review.host_response_date,
+        })
+
+
+class GuestBookingHistoryView(APIView):
+    """
+    The current user's bookings, newest first.
+    Pass ?include_archived=true to include archived bookings.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        include_archived = request.query_params.get('include_archived', '').lower() in ('1', 'true', 'yes')
+        rows = guest_booking_history(request.user, include_archived=include_archived)
+        return Response(BookingHistorySerializer(rows, many=True).data)
+
+
+class BookingCancelView(APIView):
+    """
+    Cancel a booking as its guest or as the listing's host.
+    GET previews the refund a cancellation made now would give.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsBookingGuestOrHost]
+    throttle_scope = 'bookings'
+
+    def get_booking(self, request, pk):
+        booking = get_object_or_404(Booking.objects.select_related('listing', 'guest'), pk=pk)
+        self.check_object_permissions(request, booking)
+        return booking
+
+    def get(self, request, pk):
+        booking = self.get_booking(request, pk)
+        if booking.booking_status not in CANCELLABLE_STATUSES:
+            return Response(
+                {'detail': f"Cannot cancel a {booking.booking_status} booking"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        initiated_by = 'host' if is_booking_host(request, booking) else 'guest'
+        return Response({
+            'booking': booking.pk,
+            'initiated_by': initiated_by,
+            # A string, like the serializers' decimals
+            'refund_amount': str(compute_refund(booking, initiated_by)),
+        })
+
+    def post(self, request, pk):
+        booking = self.get_booking(request, pk)
+        initiated_by = 'host' if is_booking_host(request, booking) else 'guest'
+        try:
+            booking = cancel_booking(booking, request.data.get('reason', ''), initiated_by)
+        except CancellationError as error:
+            return Response({'detail': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(BookingDetailSerializer(booking).data)
+
+
+class ListingCancelBookingsView(APIView):
+    """
+    Host cancels every upcoming booking of a listing (full refunds).
+    Pass delist=true to also take the listing off the site (inactive).
+    """
+    permission_classes = [permissions.IsAuthenticated, IsListingHost]
+    throttle_scope = 'bookings'
+
+    def post(self, request, pk):
+        listing = get_object_or_404(Listing, pk=pk)
+        self.check_object_permissions(request, listing)
+        delist = str(request.data.get('delist', '')).lower() in ('1', 'true', 'yes')
+        try:
+            cancelled = cancel_future_bookings(listing, request.data.get('reason', ''), delist=delist)
+        except CancellationError as error:
+            return Response({'detail': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'listing': listing.pk, 'cancelled': len(cancelled),
+            'is_available': listing.is_available, 'status': listing.status,
+        })
+
+
+class ExportView(APIView):
+    """Stream every booking or review as CSV or NDJSON for finance/data teams"""
+    permission_classes = [permissions.IsAdminUser]
+    export_name = None
+
+    def get(self, request):
+        fmt = request.query_params.get('output_format', 'csv')
+        if fmt not in CONTENT_TYPES:
+            return Response(
+                {'detail': f"Unsupported format. Choose one of: {', '.join(CONTENT_TYPES)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        dates = {}
+        for param in ('start', 'end'):
+            value = request.query_params.get(param)
+            dates[param] = parse_date(value) if value else None
+            if value and dates[param] is None:
+                return Response(
+                    {'detail': f"Invalid {param} date. Use YYYY-MM-DD"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        response = StreamingHttpResponse(
+            stream_export(
+                self.export_name, fmt,
+                start=dates['start'], end=dates['end'],
+                status=request.query_params.get('status')
+            ),
+            content_type=CONTENT_TYPES[fmt]
+        )
+        response['Content-Disposition'] = f'attachment; filename="{self.export_name}.{fmt}"'
+        return response
+
+
+class BookingExportView(ExportView):
+    export_name = 'bookings'
+
+
+class ReviewExportView(ExportView):
+    export_name = 'reviews'
+
+
+class OutboxEventsView(APIView):
+    """
+    Change feed of Listing/Booking/Review events in commit-safe id order.
+    Query params: consumer (required), after, limit, types (comma-separated
+    listing,booking,review). Pass the returned `next` as `after` to continue.
+
+    Each consumer has a checkpoint, like consume_outbox's, so compact_outbox
+    keeps events it has not read: `after` records that everything up to it
+    was processed, and reading resumes from the checkpoint when omitted.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        consumer = request.query_params.get('consumer', '').strip()
+        if not consumer:
+            return Response({'detail': 'consumer is required'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(consumer) > OutboxCheckpoint._meta.get_field('consumer').max_length:
+            return Response({'detail': 'consumer name is too long'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            after = request.query_params.get('after')
+            after = int(after) if after is not None else None
+            limit = int(request.query_params.get('limit', OUTBOX_BATCH_SIZE))
+        except ValueError:
+            return Response({'detail': 'after and limit must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        if after is None:
+            after = get_checkpoint(consumer)
+        else:
+            save_checkpoint(consumer, after)
+        limit = max(1, min(limit, OUTBOX_BATCH_SIZE))
+        types = request.query_params.get('types')
+        events, position = read_events(after, limit, types.split(',') if types else None)
+        return Response({
+            'events': OutboxEventSerializer(events, many=True).data,
+            'next': position,
+        })